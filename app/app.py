@@ -3,18 +3,16 @@ import os
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'models')))
 
-import sqlalchemy
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from datetime import datetime, time
-from admin import Admin
-from member import Member
-from room import Room
-from fitness_class import FitnessClass
-from billing import Bill, BillLineItem, Payment
-from user import Base
-from trainer import Trainer
+from datetime import date, datetime, time
+from itertools import islice
+from typing import TYPE_CHECKING
 
+if TYPE_CHECKING:
+    from member import Member
+    from trainer import Trainer
+
+# SQLAlchemy, the engine and the model modules are imported on first use so the
+# role prompt appears without paying for them; see get_db() and the menus.
 
 
 # 1 = admin
@@ -22,12 +20,19 @@ from trainer import Trainer
 # 3 = member
 
 # Database setup
-engine = create_engine("sqlite:///health_club.db", echo=False)
-Base.metadata.create_all(engine)
-Session = sessionmaker(bind=engine)
+Session = None
 
 def get_db():
     """Get a database session."""
+    global Session
+    if Session is None:
+        from sqlalchemy.orm import sessionmaker
+        from database import create_db_engine
+        from migrations import ensure_schema
+
+        engine = create_db_engine()
+        ensure_schema(engine)
+        Session = sessionmaker(bind=engine)
     return Session()
 
 def get_day_name(day_num: int) -> str:
@@ -51,6 +56,14 @@ def prompt_time(label: str) -> time:
         except ValueError:
             print("Invalid time format. Use HH:MM.")
 
+def prompt_date(label: str) -> date:
+    while True:
+        raw = input(f"{label} (YYYY-MM-DD): ").strip()
+        try:
+            return datetime.strptime(raw, "%Y-%m-%d").date()
+        except ValueError:
+            print("Invalid date format. Use YYYY-MM-DD.")
+
 def prompt_day(label: str) -> int:
     print("\nDays of the week:")
     print("  1: Monday")
@@ -69,7 +82,38 @@ def prompt_day(label: str) -> int:
         except ValueError:
             print("Invalid input. Enter a number.")
 
+PAGE_SIZE = 20
+
+def page_through(fetch_page, next_key, render, header: str, empty_message: str) -> int:
+    """Print rows one keyset page at a time; returns how many were shown."""
+    after = None
+    shown = 0
+    while True:
+        page = fetch_page(after, PAGE_SIZE)
+        if not page:
+            if shown == 0:
+                print(empty_message)
+            return shown
+        if shown == 0:
+            print(header)
+        for row in page:
+            render(row)
+        shown += len(page)
+        if len(page) < PAGE_SIZE:
+            return shown
+        if input("-- Press Enter for more, or q to stop: ").strip().lower() == "q":
+            return shown
+        after = next_key(page[-1])
+
 def admin_menu():
+    from admin import Admin
+    from billing import Bill, Payment
+    from fitness_class import FitnessClass
+    from member import Member
+    from room import Room
+    from timetable import WeeklyTimetable, entry_key
+    from trainer import Trainer
+
     db = get_db()
 
     while True:
@@ -84,20 +128,28 @@ def admin_menu():
                 "\t3 - Schedule Fitness Class\n"
                 "\t4 - Update Fitness Class\n"
                 "\t5 - List Fitness Classes\n"
+                "\t17 - Auto-Schedule Classes from CSV\n"
+                "\t18 - Find Free Class Slots\n"
+                "\t19 - View Upcoming Class Sessions\n"
+                "\t20 - Cancel or Restore a Class Session\n"
+                "\t21 - Swap Room for a Class Session\n"
                 "\n\t-- Billing & Payments --\n"
                 "\t6 - Generate Bill for Member\n"
                 "\t7 - Add Bill Line Item\n"
                 "\t8 - Record Payment\n"
                 "\t9 - View Bills\n"
                 "\t13 - Delete Bill\n"
+                "\t14 - Reconcile Bill Balances\n"
+                "\t15 - Import Payment Settlement File\n"
                 "\n\t-- User/Staff Management --\n"
                 "\t10 - View Members\n"
                 "\t11 - View Trainers\n"
                 "\t12 - View Trainer Availability\n"
+                "\t16 - Import Members File\n"
                 "Enter choice: "
             )
             choice = int(input(prompt))
-            if choice not in range(0, 14):
+            if choice not in range(0, 22):
                 raise ValueError
         except (ValueError, EOFError):
             print("Invalid input, try again.")
@@ -148,7 +200,6 @@ def admin_menu():
                 
                 room_id_input = input("Room ID (optional): ").strip()
                 room_id = int(room_id_input) if room_id_input else None
-                room = None
                 if room_id is not None:
                     room = db.query(Room).filter(Room.id == room_id).first()
                     if room is None:
@@ -156,12 +207,6 @@ def admin_menu():
                 
                 capacity_input = input("Capacity (optional): ").strip()
                 capacity = int(capacity_input) if capacity_input else None
-                
-                if room:
-                    if capacity is None:
-                        capacity = room.capacity
-                    elif room.capacity is not None and capacity > room.capacity:
-                        raise ValueError(f"Capacity cannot exceed room capacity ({room.capacity}).")
 
                 fitness_class = FitnessClass.schedule(
                     db=db,
@@ -229,17 +274,18 @@ def admin_menu():
                 print(f"\nUnexpected error: {e}")
 
         elif choice == 5:
-            classes = db.query(FitnessClass).order_by(FitnessClass.day_of_week, FitnessClass.start_time).all()
-            if not classes:
-                print("\nNo classes scheduled.")
-            else:
-                print("\nScheduled Classes:")
-                for cls in classes:
-                    print(
-                        f"  ID {cls.id}: {cls.name} | Trainer {cls.trainer_id} | "
-                        f"{get_day_name(cls.day_of_week)} {cls.start_time} - {cls.end_time} | Room {cls.room_id or 'N/A'} | "
-                        f"Capacity {cls.capacity or 'N/A'}"
-                    )
+            timetable = WeeklyTimetable.current(db)
+            page_through(
+                timetable.page,
+                entry_key,
+                lambda cls: print(
+                    f"  ID {cls['id']}: {cls['name']} | Trainer {cls['trainer_name']} | "
+                    f"{cls['day_name']} {cls['start_time']} - {cls['end_time']} | Room {cls['room_name'] or 'N/A'} | "
+                    f"Capacity {cls['capacity'] or 'N/A'} | Enrolled {cls['enrolled_count']}"
+                ),
+                header="\nScheduled Classes:",
+                empty_message="\nNo classes scheduled.",
+            )
 
         elif choice == 6:
             try:
@@ -264,13 +310,7 @@ def admin_menu():
                 if not description:
                     raise ValueError("Description cannot be empty.")
                 amount = float(input("Amount: ").strip())
-                item = BillLineItem(bill_id=bill.id, description=description, amount=amount)
-                db.add(item)
-                db.commit()
-                db.refresh(item)
-                # Refresh bill to get updated computed properties
-                db.refresh(bill)
-                bill.update_status(db)
+                Admin.add_bill_line_item(db=db, bill_id=bill.id, description=description, amount=amount)
                 print(
                     f"\nLine item added. Total: {bill.total_amount:.2f}, "
                     f"Due: {bill.amount_due:.2f}"
@@ -296,7 +336,8 @@ def admin_menu():
                 payment = Payment.record(db=db, bill=bill, amount=amount)
                 print(
                     f"\nPayment recorded. Amount: {payment.amount:.2f}, "
-                    f"New amount due: {bill.amount_due:.2f}"
+                    f"New amount due: {bill.amount_due:.2f}, "
+                    f"Transaction code: {payment.transaction_code}"
                 )
             except ValueError as e:
                 print(f"\nError: {e}")
@@ -306,15 +347,9 @@ def admin_menu():
         elif choice == 9:
             try:
                 member_input = input("Member ID (press Enter for all): ").strip()
-                query = db.query(Bill)
-                if member_input:
-                    member_id = int(member_input)
-                    query = query.filter(Bill.member_id == member_id)
-                bills = query.order_by(Bill.created_at.desc()).all()
-                if not bills:
-                    print("\nNo bills found.")
-                    continue
-                for bill in bills:
+                member_id = int(member_input) if member_input else None
+
+                def print_bill(bill):
                     print(
                         f"\nBill {bill.id} | Member {bill.member_id} | "
                         f"Total {bill.total_amount:.2f} | Paid {bill.amount_paid:.2f} | "
@@ -330,39 +365,50 @@ def admin_menu():
                             print(
                                 f"    - {payment.created_at.strftime('%Y-%m-%d %H:%M')}: ${payment.amount:.2f}"
                             )
+
+                page_through(
+                    lambda after, limit: Bill.iter_page(db, after_id=after, limit=limit, member_id=member_id),
+                    lambda bill: bill.id,
+                    print_bill,
+                    header="\nBills:",
+                    empty_message="\nNo bills found.",
+                )
             except ValueError as e:
                 print(f"\nError: {e}")
             except Exception as e:
                 print(f"\nUnexpected error: {e}")
 
         elif choice == 10:
-            members = db.query(Member).order_by(Member.id).all()
-            if not members:
-                print("\nNo members found.")
-            else:
-                print("\nMembers:")
-                for member in members:
-                    age = member.age if member.age is not None else "N/A"
-                    gender = member.gender or "N/A"
-                    current_weight = f"{member.current_weight} kg" if member.current_weight else "N/A"
-                    weight_goal = f"{member.weight_goal} kg" if member.weight_goal else "N/A"
-                    print(
-                        f"  ID {member.id}: {member.name or 'Unnamed'} | "
-                        f"{member.email or 'No Email'} | Age: {age} | Gender: {gender} | "
-                        f"Weight: {current_weight} | Goal: {weight_goal}"
-                    )
+            def print_member(member):
+                age = member.age if member.age is not None else "N/A"
+                gender = member.gender or "N/A"
+                current_weight = f"{member.current_weight} kg" if member.current_weight else "N/A"
+                weight_goal = f"{member.weight_goal} kg" if member.weight_goal else "N/A"
+                print(
+                    f"  ID {member.id}: {member.name or 'Unnamed'} | "
+                    f"{member.email or 'No Email'} | Age: {age} | Gender: {gender} | "
+                    f"Weight: {current_weight} | Goal: {weight_goal}"
+                )
+
+            page_through(
+                lambda after, limit: Member.iter_page(db, after_id=after, limit=limit),
+                lambda member: member.id,
+                print_member,
+                header="\nMembers:",
+                empty_message="\nNo members found.",
+            )
 
         elif choice == 11:
-            trainers = db.query(Trainer).order_by(Trainer.id).all()
-            if not trainers:
-                print("\nNo trainers found.")
-            else:
-                print("\nTrainers:")
-                for trainer in trainers:
-                    print(
-                        f"  ID {trainer.id}: {trainer.name or 'Unnamed'} | "
-                        f"{trainer.email or 'No Email'}"
-                    )
+            page_through(
+                lambda after, limit: Trainer.iter_page(db, after_id=after, limit=limit),
+                lambda trainer: trainer.id,
+                lambda trainer: print(
+                    f"  ID {trainer.id}: {trainer.name or 'Unnamed'} | "
+                    f"{trainer.email or 'No Email'}"
+                ),
+                header="\nTrainers:",
+                empty_message="\nNo trainers found.",
+            )
 
         elif choice == 12:
             availabilities = Admin.get_all_trainer_availabilities(db=db)
@@ -391,7 +437,180 @@ def admin_menu():
                 db.rollback()
                 print(f"\nUnexpected error: {e}")
 
+        elif choice == 14:
+            try:
+                repaired = Admin.reconcile_bill_balances(db=db)
+                print(f"\nReconciled bill balances. {repaired} bill(s) repaired.")
+            except Exception as e:
+                db.rollback()
+                print(f"\nUnexpected error: {e}")
+
+        elif choice == 15:
+            try:
+                path = input("Settlement file path (.csv or .jsonl): ").strip()
+                if not path:
+                    raise ValueError("Path cannot be empty.")
+                report = Admin.import_payment_file(db=db, path=path)
+                print(
+                    f"\nImported {report['imported']} of {report['processed']} payment(s) "
+                    f"in {report['elapsed_seconds']:.2f}s ({report['rows_per_second']:.0f} rows/s)."
+                )
+                if report["duplicate_transaction_codes"]:
+                    print(f"  Duplicate transaction codes: {len(report['duplicate_transaction_codes'])}")
+                if report["rejected"]:
+                    print(f"  Rejected rows ({len(report['rejected'])}):")
+                    for line_number, reason in report["rejected"]:
+                        print(f"    - line {line_number}: {reason}")
+            except (ValueError, OSError) as e:
+                print(f"\nError: {e}")
+            except Exception as e:
+                db.rollback()
+                print(f"\nUnexpected error: {e}")
+
+        elif choice == 16:
+            try:
+                path = input("Members CSV path (name,email,age,gender,current_weight,weight_goal): ").strip()
+                if not path:
+                    raise ValueError("Path cannot be empty.")
+                report = Admin.import_member_file(db=db, path=path)
+                print(
+                    f"\nImported {report['imported']} of {report['processed']} member(s) "
+                    f"in {report['elapsed_seconds']:.2f}s ({report['rows_per_second']:.0f} rows/s)."
+                )
+                if report["duplicate_emails"]:
+                    print(f"  Duplicate emails: {len(report['duplicate_emails'])}")
+                if report["rejected"]:
+                    print(f"  Rejected rows ({len(report['rejected'])}):")
+                    for line_number, reason in report["rejected"]:
+                        print(f"    - line {line_number}: {reason}")
+            except (ValueError, OSError) as e:
+                print(f"\nError: {e}")
+            except Exception as e:
+                db.rollback()
+                print(f"\nUnexpected error: {e}")
+
+        elif choice == 17:
+            try:
+                path = input(
+                    "Desired classes CSV path "
+                    "(name,duration_minutes,capacity,trainer_id,room_id,days,earliest,latest): "
+                ).strip()
+                if not path:
+                    raise ValueError("Path cannot be empty.")
+                plan = Admin.auto_schedule_file(db=db, path=path)
+                print(f"\nPlaced {len(plan['placed'])} class(es) in {plan['elapsed_seconds']:.2f}s:")
+                for row in plan["placed"]:
+                    print(
+                        f"  line {row['position']}: {row['name']} | Trainer {row['trainer_id']} | Room {row['room_id']} | "
+                        f"{get_day_name(row['day_of_week'])} {row['start_time']} - {row['end_time']}"
+                    )
+                if plan["unplaced"]:
+                    print(f"  Could not place ({len(plan['unplaced'])}):")
+                    for line_number, reason in plan["unplaced"]:
+                        print(f"    - line {line_number}: {reason}")
+                if not plan["placed"]:
+                    continue
+                if input("\nSchedule these classes? (y/N): ").strip().lower() != "y":
+                    print("Nothing scheduled.")
+                    continue
+                plan = Admin.auto_schedule_file(db=db, path=path, apply=True)
+                print(f"\nScheduled {len(plan['class_ids'])} class(es).")
+            except (ValueError, OSError) as e:
+                print(f"\nError: {e}")
+            except Exception as e:
+                db.rollback()
+                print(f"\nUnexpected error: {e}")
+
+        elif choice == 18:
+            try:
+                day = prompt_day("Day")
+                duration = int(input("Class length in minutes: ").strip())
+                capacity_input = input("Minimum room capacity (optional): ").strip()
+                min_capacity = int(capacity_input) if capacity_input else None
+                slots = Admin.find_free_slots(
+                    db=db, day_of_week=day, duration=duration, min_room_capacity=min_capacity
+                )
+                if not slots:
+                    print("\nNo free slots found.")
+                    continue
+                trainer_names = dict(db.query(Trainer.id, Trainer.name).filter(Trainer.id.in_({s["trainer_id"] for s in slots})))
+                room_names = dict(db.query(Room.id, Room.name).filter(Room.id.in_({s["room_id"] for s in slots})))
+                print(f"\nBest free slots on {get_day_name(day)} ({len(slots)} found):")
+                for slot in slots[:PAGE_SIZE]:
+                    print(
+                        f"  {slot['start_time']} - {slot['end_time']} | Trainer {trainer_names[slot['trainer_id']]} "
+                        f"| Room {room_names[slot['room_id']]} (capacity {slot['room_capacity'] or 'N/A'})"
+                    )
+            except ValueError as e:
+                print(f"\nError: {e}")
+            except Exception as e:
+                print(f"\nUnexpected error: {e}")
+
+        elif choice == 19:
+            try:
+                days_input = input("How many days ahead (default 30): ").strip()
+                days = int(days_input) if days_input else 30
+                if days <= 0:
+                    raise ValueError("Days must be positive.")
+                # the sessions come from a generator, so each page just continues it
+                sessions = Admin.get_upcoming_sessions(db=db, days=days)
+                page_through(
+                    lambda after, limit: list(islice(sessions, limit)),
+                    lambda session: None,
+                    lambda session: print(
+                        f"  {session['date']} {get_day_name(session['date'].isoweekday())[:3]} "
+                        f"{session['start_time']} - {session['end_time']} | Class {session['class_id']}: {session['name']} "
+                        f"| Room {session['room_id'] or 'N/A'}"
+                        + ("" if session["status"] == "scheduled" else f" | {session['status'].replace('_', ' ').upper()}")
+                        + (f" ({session['note']})" if session["note"] else "")
+                    ),
+                    header=f"\nClass sessions over the next {days} day(s):",
+                    empty_message="\nNo class sessions in that period.",
+                )
+            except ValueError as e:
+                print(f"\nError: {e}")
+            except Exception as e:
+                print(f"\nUnexpected error: {e}")
+
+        elif choice == 20:
+            try:
+                class_id = int(input("Class ID: ").strip())
+                occurs_on = prompt_date("Session date")
+                action = input("c - Cancel session, r - Restore as scheduled: ").strip().lower()
+                if action == "c":
+                    note = input("Reason (optional): ").strip() or None
+                    Admin.cancel_class_session(db=db, class_id=class_id, occurs_on=occurs_on, note=note)
+                    print(f"\nSession on {occurs_on} cancelled.")
+                elif action == "r":
+                    if Admin.restore_class_session(db=db, class_id=class_id, occurs_on=occurs_on):
+                        print(f"\nSession on {occurs_on} restored.")
+                    else:
+                        print("\nThat session had no changes to restore.")
+                else:
+                    raise ValueError("Enter c or r.")
+            except ValueError as e:
+                print(f"\nError: {e}")
+            except Exception as e:
+                db.rollback()
+                print(f"\nUnexpected error: {e}")
+
+        elif choice == 21:
+            try:
+                class_id = int(input("Class ID: ").strip())
+                occurs_on = prompt_date("Session date")
+                room_id = int(input("New room ID: ").strip())
+                note = input("Reason (optional): ").strip() or None
+                Admin.swap_class_session_room(db=db, class_id=class_id, occurs_on=occurs_on, room_id=room_id, note=note)
+                print(f"\nSession on {occurs_on} moved to room {room_id}.")
+            except ValueError as e:
+                print(f"\nError: {e}")
+            except Exception as e:
+                db.rollback()
+                print(f"\nUnexpected error: {e}")
+
 def member_menu():
+    from member import Member
+
     db = get_db()
     
     while True:
@@ -452,7 +671,7 @@ def member_menu():
                 print("\n=== Member Login ===")
                 email = input("Enter your email: ").strip()
                 
-                member = db.query(Member).filter(Member.email == email).first()
+                member = Member.get_by_email(db, email)
                 
                 if member is None:
                     print("\nInvalid email.")
@@ -464,7 +683,10 @@ def member_menu():
             except Exception as e:
                 print(f"\n✗ Error: {e}")
 
-def logged_in_member_menu(db, member: Member):
+def logged_in_member_menu(db, member: "Member"):
+    from fitness_class import FitnessClass
+    from timetable import WeeklyTimetable, entry_key
+
     while True:
         try:
             prompt = (
@@ -473,11 +695,13 @@ def logged_in_member_menu(db, member: Member):
                 "\t1 - View Dashboard\n"
                 "\t2 - Update Profile\n"
                 "\t3 - Register for Group Class\n"
+                "\t4 - My Waitlists\n"
+                "\t5 - Unregister from Group Class\n"
                 "Enter choice: "
             )
 
             choice = int(input(prompt))
-            if choice not in range(0, 4):
+            if choice not in range(0, 6):
                 raise ValueError
             
         except (ValueError, EOFError):
@@ -538,24 +762,57 @@ def logged_in_member_menu(db, member: Member):
                 print("\n=== Register for Group Class ===")
                 
                 # Show available group classes
-                available_classes = (
-                    db.query(FitnessClass)
-                    .order_by(FitnessClass.day_of_week, FitnessClass.start_time)
-                    .all()
-                )
-                
-                if not available_classes:
-                    print("No available group classes found.")
+                def print_class(cls):
+                    seats = "open" if cls["seats_left"] is None else f"{cls['seats_left']} seats left"
+                    print(f"  Class ID: {cls['id']} | {cls['name']} | {cls['trainer_name']}")
+                    print(
+                        f"    {cls['day_name']} | {cls['start_time']} - {cls['end_time']} "
+                        f"| Room: {cls['room_name'] or 'N/A'} | {seats}"
+                    )
+
+                def print_open_class(row):
+                    seats = "open" if row.seats_left is None else f"{row.seats_left} seats left"
+                    print(f"  Class ID: {row.FitnessClass.id} | {row.FitnessClass.name}")
+                    print(
+                        f"    {get_day_name(row.FitnessClass.day_of_week)} | "
+                        f"{row.FitnessClass.start_time} - {row.FitnessClass.end_time} | {seats}"
+                    )
+
+                seats_only = input("Only show classes with open seats? (y/N): ").strip().lower() == "y"
+                if seats_only:
+                    shown = page_through(
+                        lambda after, limit: FitnessClass.with_seat_counts(
+                            db, seats_only=True, after_key=after
+                        ).limit(limit).all(),
+                        lambda row: row.FitnessClass.page_key(),
+                        print_open_class,
+                        header="\nGroup Classes With Open Seats:",
+                        empty_message="No group classes with open seats found.",
+                    )
+                else:
+                    timetable = WeeklyTimetable.current(db)
+                    shown = page_through(
+                        timetable.page,
+                        entry_key,
+                        print_class,
+                        header="\nAvailable Group Classes:",
+                        empty_message="No available group classes found.",
+                    )
+                if not shown:
                     continue
                 
-                print("\nAvailable Group Classes:")
-                for cls in available_classes:
-                    print(f"  Class ID: {cls.id} | {cls.name}")
-                    print(f"    {get_day_name(cls.day_of_week)} | {cls.start_time} - {cls.end_time}")
-                
                 class_id = int(input("\nEnter class ID to register: ").strip())
                 
-                enrollment = member.register_for_class(db=db, class_id=class_id)
+                try:
+                    enrollment = member.register_for_class(db=db, class_id=class_id)
+                except ValueError as e:
+                    if str(e) != "Class is at full capacity":
+                        raise
+                    if input("\nClass is full. Join the waitlist? (y/N): ").strip().lower() != "y":
+                        continue
+                    position = member.join_waitlist(db=db, class_id=class_id)
+                    print(f"\nAdded to the waitlist at position {position}. You will be enrolled automatically when a seat opens.")
+                    continue
                 print(f"\nRegistered for group class successfully! Enrollment date: {enrollment.registration_date}")
                 
             except ValueError as e:
@@ -563,7 +820,50 @@ def logged_in_member_menu(db, member: Member):
             except Exception as e:
                 print(f"\nError: {e}")
 
+        elif choice == 4:
+            try:
+                print("\n=== My Waitlists ===")
+                positions = member.get_waitlist_positions(db)
+                if not positions:
+                    print("You are not on any waitlist.")
+                    continue
+                for class_id, name, position in positions:
+                    print(f"  Class ID: {class_id} | {name} | Position {position}")
+                leave_input = input("\nEnter a class ID to leave its waitlist (Enter to go back): ").strip()
+                if leave_input:
+                    if member.leave_waitlist(db=db, class_id=int(leave_input)):
+                        print("\nLeft the waitlist.")
+                    else:
+                        print("\nYou are not on that waitlist.")
+            except ValueError as e:
+                print(f"\nError: {e}")
+            except Exception as e:
+                print(f"\nError: {e}")
+
+        elif choice == 5:
+            try:
+                print("\n=== Unregister from Group Class ===")
+                enrolled = member.get_dashboard(db)["enrolled_classes"]
+                if not enrolled:
+                    print("You are not registered for any group class.")
+                    continue
+                for session in enrolled:
+                    print(f"  Class ID: {session['session_id']} | {session['name']}")
+                    print(f"    {get_day_name(session['day_of_week'])} | {session['start_time']} - {session['end_time']}")
+
+                class_id = int(input("\nEnter class ID to unregister from: ").strip())
+                promoted = member.unregister_from_class(db=db, class_id=class_id)
+                print("\nUnregistered from group class.")
+                if promoted:
+                    print("Your seat went to the next member on the waitlist.")
+            except ValueError as e:
+                print(f"\nError: {e}")
+            except Exception as e:
+                print(f"\nError: {e}")
+
 def trainer_menu():
+    from trainer import Trainer
+
     db = get_db()
 
     while True:
@@ -604,13 +904,7 @@ def trainer_menu():
                 print("\n=== Trainer Login ===")
                 email = input("Enter your email: ").strip()
 
-                trainer = (
-                    db.query(Trainer)
-                    .filter(
-                        Trainer.email == email,
-                    )
-                    .first()
-                )
+                trainer = Trainer.get_by_email(db, email)
 
                 if trainer is None:
                     print("\nInvalid email.")
@@ -621,8 +915,9 @@ def trainer_menu():
             except Exception as e:
                 print(f"\n✗ Error: {e}")
 
-def logged_in_trainer_menu(db, trainer: Trainer):
+def logged_in_trainer_menu(db, trainer: "Trainer"):
     """Menu for logged-in trainer operations."""
+    from timetable import WeeklyTimetable
 
     while True:
         try:
@@ -634,12 +929,13 @@ def logged_in_trainer_menu(db, trainer: Trainer):
                 "\n\t-- Availability --\n"
                 "\t2 - Set Availability\n"
                 "\t3 - View Availability\n"
+                "\t5 - Replace Weekly Availability\n"
                 "\n\t-- Members --\n"
                 "\t4 - Lookup Member\n"
                 "Enter choice: "
             )
             choice = int(input(prompt))
-            if choice not in range(0, 5):
+            if choice not in range(0, 6):
                 raise ValueError
         except (ValueError, EOFError):
             print("Invalid input, try again.")
@@ -652,15 +948,16 @@ def logged_in_trainer_menu(db, trainer: Trainer):
         elif choice == 1:
             try:
                 print("\n=== View Schedule ===")
-                sessions = trainer.get_schedule(db=db)
+                sessions = WeeklyTimetable.current(db).for_trainer(trainer.id)
                 if not sessions:
                     print("No sessions found.")
                     continue
                 for session in sessions:
                     print(
-                        f"  Class {session.id}: {get_day_name(session.day_of_week)} | {session.start_time} - {session.end_time} "
-                        f"| Name: {session.name} "
-                        f"| Room: {session.room_id or 'N/A'}"
+                        f"  Class {session['id']}: {session['day_name']} | {session['start_time']} - {session['end_time']} "
+                        f"| Name: {session['name']} "
+                        f"| Room: {session['room_name'] or 'N/A'} "
+                        f"| Enrolled: {session['enrolled_count']}/{session['capacity'] or 'N/A'}"
                     )
             except Exception as e:
                 print(f"\n✗ Error: {e}")
@@ -706,18 +1003,19 @@ def logged_in_trainer_menu(db, trainer: Trainer):
         elif choice == 4:
             try:
                 print("\n=== Member Lookup ===")
-                name = input("Enter member name: ").strip()
+                name = input("Enter member name (or the start of it): ").strip()
                 if not name:
                     raise ValueError("Name cannot be empty.")
-                member = trainer.lookup_member(db=db, name=name)
-                if member is None:
+                members = trainer.search_members(db=db, query=name, limit=10)
+                if not members:
                     print("Member not found.")
                     continue
-                print(f"\nMember: {member.name}")
-                print(f"  Email: {member.email}")
-                print(f"  Age: {member.age if member.age is not None else 'N/A'}")
-                print(f"  Gender: {member.gender or 'N/A'}")
-                print(f"  Weight Goal: {member.weight_goal if member.weight_goal is not None else 'N/A'} kg")
+                for member in members:
+                    print(f"\nMember: {member.name}")
+                    print(f"  Email: {member.email}")
+                    print(f"  Age: {member.age if member.age is not None else 'N/A'}")
+                    print(f"  Gender: {member.gender or 'N/A'}")
+                    print(f"  Weight Goal: {member.weight_goal if member.weight_goal is not None else 'N/A'} kg")
             except ValueError as e:
                 print(f"\nError: {e}")
             except Exception as e:
@@ -737,6 +1035,32 @@ def logged_in_trainer_menu(db, trainer: Trainer):
             except Exception as e:
                 print(f"\nError: {e}")
 
+        elif choice == 5:
+            print("\n=== Replace Weekly Availability ===")
+            print("Enter every window for the week; anything not entered is removed.")
+            windows = []
+            while True:
+                try:
+                    day_input = int(input("Enter day 1-7 (0 to Save): ").strip())
+                    if day_input == 0:
+                        break
+                    if not (1 <= day_input <= 7):
+                        print("Invalid day. Please enter 1-7.")
+                        continue
+                    windows.append((day_input, prompt_time("Start time"), prompt_time("End time")))
+                except ValueError:
+                    print("Invalid input. Enter a number.")
+            try:
+                result = trainer.replace_weekly_availability(db=db, windows=windows)
+                print(
+                    f"\nAvailability saved: {result['added']} added, {result['removed']} removed, "
+                    f"{result['unchanged']} unchanged."
+                )
+            except ValueError as e:
+                print(f"\nError: {e}")
+            except Exception as e:
+                print(f"\nUnexpected error: {e}")
+
 def main():
     # while loop allows us to exit back to role selection
     while True:
@@ -774,5 +1098,101 @@ def main():
         else:
             print("Unknown role, try again.")
 
+def init_db_command() -> int:
+    from database import create_db_engine
+    from migrations import init_db
+
+    version = init_db(create_db_engine())
+    print(f"Database schema is at version {version}.")
+    return 0
+
+def startup_time_command(args) -> int:
+    """Time `app.py` from launch to exit at the role prompt; non-zero on regression."""
+    import argparse
+    import statistics
+    import subprocess
+    import time as clock
+
+    parser = argparse.ArgumentParser(prog="app.py startup-time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=None)
+    options = parser.parse_args(args)
+
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    probe = subprocess.run(
+        [sys.executable, "-c", f"import sys; sys.path.insert(0, {app_dir!r}); import app; print('sqlalchemy' in sys.modules)"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    eager_imports = probe.stdout.strip() == "True"
+
+    samples = []
+    for _ in range(options.runs):
+        started = clock.perf_counter()
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__)],
+            input="0\n",
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        samples.append((clock.perf_counter() - started) * 1000)
+
+    median = statistics.median(samples)
+    print(f"Startup to role prompt and exit: median {median:.1f} ms, best {min(samples):.1f} ms over {options.runs} run(s)")
+    print(f"SQLAlchemy imported at module load: {'yes' if eager_imports else 'no'}")
+
+    if eager_imports:
+        print("FAIL: app.py must not import SQLAlchemy or the models at import time.")
+        return 1
+    if options.budget_ms is not None and median > options.budget_ms:
+        print(f"FAIL: median exceeds budget of {options.budget_ms:.1f} ms.")
+        return 1
+    return 0
+
+def check_query_plans_command(args) -> int:
+    """EXPLAIN the hot request-path queries; non-zero if any falls back to a full scan."""
+    from query_plans import check_query_plans
+
+    failures = 0
+    for result in check_query_plans():
+        status = "FAIL" if result["full_scans"] else "ok"
+        failures += bool(result["full_scans"])
+        print(f"[{status}] {result['path']}: {result['statement'][:100]}")
+        for line in result["plan"]:
+            print(f"         {line}")
+    print(f"\n{failures} statement(s) fall back to a full table scan.")
+    return 1 if failures else 0
+
+def check_statement_counts_command(args) -> int:
+    """Load listings over 1 and N rows; non-zero if the statement count grows with N."""
+    import argparse
+    from statement_counts import check_statement_counts
+
+    parser = argparse.ArgumentParser(prog="app.py check-statement-counts")
+    parser.add_argument("--rows", type=int, default=50)
+    options = parser.parse_args(args)
+
+    failures = 0
+    for result in check_statement_counts(options.rows):
+        status = "ok" if result["bounded"] else "FAIL"
+        failures += not result["bounded"]
+        print(f"[{status}] {result['path']}: {result['single']} statement(s) for 1 row, {result['many']} for {options.rows}")
+    print(f"\n{failures} listing(s) issue more statements as rows grow.")
+    return 1 if failures else 0
+
+COMMANDS = {
+    "init-db": lambda args: init_db_command(),
+    "startup-time": startup_time_command,
+    "check-query-plans": check_query_plans_command,
+    "check-statement-counts": check_statement_counts_command,
+}
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        if sys.argv[1] not in COMMANDS:
+            print(f"Unknown command: {sys.argv[1]}. Available: {', '.join(COMMANDS)}")
+            sys.exit(2)
+        sys.exit(COMMANDS[sys.argv[1]](sys.argv[2:]))
     main()
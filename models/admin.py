@@ -1,9 +1,15 @@
+from datetime import date
 from sqlalchemy.orm import Session as OrmSession
 from room import Room
 from fitness_class import FitnessClass
-from billing import Bill, BillLineItem, Payment
+from billing import Bill, BillLineItem, Payment, to_cents
 from trainer_availability import TrainerAvailability
 from trainer import Trainer
+from batching import read_csv_rows
+from payment_import import import_payments, read_settlement_rows
+from member_import import import_members
+from schedule_solver import find_free_slots, solve_schedule
+from class_occurrence import ClassException, upcoming_occurrences
 
 
 class Admin:
@@ -39,6 +45,15 @@ class Admin:
             capacity=capacity,
         )
 
+    @classmethod
+    def define_classes_bulk(
+        cls,
+        db: "OrmSession",
+        rows,
+        all_or_nothing: bool = False,
+    ) -> tuple[list[int], list[tuple[int, str]]]:
+        return FitnessClass.schedule_bulk(db=db, rows=rows, all_or_nothing=all_or_nothing)
+
     @classmethod
     def update_class_schedule(
         cls,
@@ -65,6 +80,68 @@ class Admin:
             capacity=capacity,
         )
 
+    @classmethod
+    def auto_schedule_classes(cls, db: "OrmSession", rows, apply: bool = False) -> dict:
+        # rows are (position, desired class) pairs; see schedule_solver.parse_class_request
+        plan = solve_schedule(db=db, rows=rows)
+        plan["class_ids"] = []
+        if apply and plan["placed"]:
+            placed = plan["placed"]
+            class_ids, errors = FitnessClass.schedule_bulk(
+                db=db,
+                rows=[{key: value for key, value in row.items() if key != "position"} for row in placed],
+            )
+            # schedule_bulk re-checks every slot against the database, so a
+            # class booked by someone else since the solver loaded is caught here
+            failed = {index for index, _ in errors}
+            plan["class_ids"] = class_ids
+            plan["placed"] = [row for index, row in enumerate(placed) if index not in failed]
+            plan["unplaced"].extend((placed[index]["position"], msg) for index, msg in errors)
+            plan["unplaced"].sort()
+        return plan
+
+    @classmethod
+    def auto_schedule_file(cls, db: "OrmSession", path: str, apply: bool = False) -> dict:
+        return cls.auto_schedule_classes(db=db, rows=read_csv_rows(path), apply=apply)
+
+    @classmethod
+    def find_free_slots(
+        cls,
+        db: "OrmSession",
+        day_of_week: int,
+        duration: int,
+        min_room_capacity: int | None = None,
+    ) -> list[dict]:
+        return find_free_slots(
+            db=db,
+            day_of_week=day_of_week,
+            duration=duration,
+            min_room_capacity=min_room_capacity,
+        )
+
+    @classmethod
+    def get_upcoming_sessions(cls, db: "OrmSession", days: int = 30):
+        return upcoming_occurrences(db=db, days=days)
+
+    @classmethod
+    def cancel_class_session(cls, db: "OrmSession", class_id: int, occurs_on: date, note: str | None = None) -> ClassException:
+        return ClassException.cancel(db=db, class_id=class_id, occurs_on=occurs_on, note=note)
+
+    @classmethod
+    def swap_class_session_room(
+        cls,
+        db: "OrmSession",
+        class_id: int,
+        occurs_on: date,
+        room_id: int,
+        note: str | None = None,
+    ) -> ClassException:
+        return ClassException.swap_room(db=db, class_id=class_id, occurs_on=occurs_on, room_id=room_id, note=note)
+
+    @classmethod
+    def restore_class_session(cls, db: "OrmSession", class_id: int, occurs_on: date) -> bool:
+        return ClassException.restore(db=db, class_id=class_id, occurs_on=occurs_on)
+
     @classmethod
     def generate_bill(cls, db: "OrmSession", member_id: int) -> Bill:
         return Bill.create(db=db, member_id=member_id)
@@ -76,37 +153,53 @@ class Admin:
         bill_id: int,
         description: str,
         amount: float,
+        commit: bool = True,
     ) -> BillLineItem:
-        bill = db.query(Bill).filter(Bill.id == bill_id).first()
-        if bill is None:
+        # stored already rounded, so reconcile_balances() sums the same cents
+        cents = to_cents(amount)
+        if not Bill.apply_balance_delta(db, bill_id, total_cents=cents):
             raise ValueError("Bill not found")
 
         item = BillLineItem(
             bill_id=bill_id,
             description=description,
-            amount=amount,
+            amount=cents / 100,
         )
 
         db.add(item)
-        db.commit()
-        db.refresh(item)
-        bill.update_status(db)
+        if commit:
+            db.commit()
+        else:
+            db.flush()
 
         return item
 
     @classmethod
-    def record_payment_for_bill(cls, db: "OrmSession", bill_id: int) -> Payment:
+    def record_payment_for_bill(cls, db: "OrmSession", bill_id: int, amount: float) -> Payment:
         bill = db.query(Bill).filter(Bill.id == bill_id).first()
         if bill is None:
             raise ValueError("Bill not found")
 
-        return Payment.record(db=db, bill=bill)
+        return Payment.record(db=db, bill=bill, amount=amount)
+
+    @classmethod
+    def import_payment_file(cls, db: "OrmSession", path: str, chunk_size: int = 1000) -> dict:
+        return import_payments(db=db, rows=read_settlement_rows(path), chunk_size=chunk_size)
+
+    @classmethod
+    def import_member_file(cls, db: "OrmSession", path: str, chunk_size: int = 1000) -> dict:
+        return import_members(db=db, rows=read_csv_rows(path), chunk_size=chunk_size)
+
+    @classmethod
+    def reconcile_bill_balances(cls, db: "OrmSession") -> int:
+        return Bill.reconcile_balances(db=db)
 
     @classmethod
     def get_all_trainer_availabilities(cls, db: "OrmSession") -> list[TrainerAvailability]:
         return (
             db.query(TrainerAvailability)
             .join(Trainer)
+            .options(*TrainerAvailability.with_trainer())
             .order_by(Trainer.name, TrainerAvailability.day_of_week, TrainerAvailability.start_time)
             .all()
         )
\ No newline at end of file
@@ -0,0 +1,19 @@
+import csv
+from itertools import islice
+
+
+def chunks(rows, size: int):
+    # lists of up to `size` items, pulled lazily from any iterable
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def read_csv_rows(path: str):
+    # yields (line_number, row) lazily; line 1 is the header
+    with open(path, newline="") as handle:
+        for line_number, row in enumerate(csv.DictReader(handle), start=2):
+            yield line_number, row
@@ -1,19 +1,38 @@
+import math
 from datetime import datetime
-from random import randint
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, func
-from sqlalchemy.orm import relationship, Session as OrmSession
+from decimal import ROUND_HALF_UP, Decimal
+from sqlalchemy import BigInteger, Column, Integer, String, Float, DateTime, ForeignKey, case, cast, func, select, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import relationship, selectinload, Session as OrmSession
 from sqlalchemy.ext.hybrid import hybrid_property
 from user import Base, User
+from transaction_code import next_transaction_code
+
+
+CODE_ATTEMPTS = 3
+CENT = Decimal("0.01")
+
+
+def to_cents(amount: float) -> int:
+    if not math.isfinite(amount):
+        raise ValueError("Amount must be a finite number.")
+    # half away from zero on the decimal the user typed (0.125 -> 13), not
+    # Python's half-to-even on the binary float
+    return int(Decimal(str(amount)).quantize(CENT, rounding=ROUND_HALF_UP) * 100)
 
 
 class Bill(Base):
-    #2nf/3nf: amounts computed via hybrid properties
+    # line items and payments remain the source of truth; total_cents/paid_cents
+    # are running sums kept in the same transaction as every child insert and
+    # repaired by reconcile_balances()
     __tablename__ = "bills"
 
     id = Column(Integer, primary_key=True, index=True)
     member_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     status = Column(String, nullable=False, default="pending")
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    total_cents = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    paid_cents = Column(Integer, nullable=False, default=0, server_default=text("0"))
 
     member = relationship("User")
     line_items = relationship("BillLineItem", back_populates="bill", cascade="all, delete-orphan")
@@ -21,29 +40,117 @@ class Bill(Base):
 
     @hybrid_property
     def total_amount(self) -> float:
-        return sum(item.amount for item in self.line_items) if self.line_items else 0.0
+        return (self.total_cents or 0) / 100
+
+    @total_amount.expression
+    def total_amount(cls):
+        return cls.total_cents / 100.0
 
     @hybrid_property
     def amount_paid(self) -> float:
-        return sum(
-            p.amount for p in self.payments if p.status == "completed"
-        ) if self.payments else 0.0
+        return (self.paid_cents or 0) / 100
+
+    @amount_paid.expression
+    def amount_paid(cls):
+        return cls.paid_cents / 100.0
 
     @hybrid_property
     def amount_due(self) -> float:
-        return max(self.total_amount - self.amount_paid, 0.0)
-
-    def update_status(self, db: "OrmSession") -> "Bill":
-        if self.amount_due <= 0 and self.total_amount > 0:
-            self.status = "paid"
-        elif self.amount_paid > 0:
-            self.status = "partial"
-        else:
-            self.status = "pending"
-        db.add(self)
-        db.commit()
-        db.refresh(self)
-        return self
+        return max((self.total_cents or 0) - (self.paid_cents or 0), 0) / 100
+
+    @amount_due.expression
+    def amount_due(cls):
+        due = cls.total_cents - cls.paid_cents
+        return case((due > 0, due), else_=0) / 100.0
+
+    @staticmethod
+    def _status_for(total_cents, paid_cents):
+        return case(
+            ((total_cents > 0) & (paid_cents >= total_cents), "paid"),
+            (paid_cents > 0, "partial"),
+            else_="pending",
+        )
+
+    @classmethod
+    def with_details(cls) -> tuple:
+        # loader options for views that print every line item and payment:
+        # one extra SELECT ... IN per collection instead of one per bill
+        return (
+            selectinload(cls.line_items),
+            selectinload(cls.payments),
+        )
+
+    @classmethod
+    def iter_page(
+        cls,
+        db: "OrmSession",
+        after_id: int | None = None,
+        limit: int = 50,
+        member_id: int | None = None,
+    ) -> list["Bill"]:
+        # newest first, keyed on the primary key
+        query = db.query(cls).options(*cls.with_details())
+        if member_id is not None:
+            query = query.filter(cls.member_id == member_id)
+        if after_id is not None:
+            query = query.filter(cls.id < after_id)
+        return query.order_by(cls.id.desc()).limit(limit).all()
+
+    @classmethod
+    def apply_balance_delta(
+        cls,
+        db: "OrmSession",
+        bill_id: int,
+        total_cents: int = 0,
+        paid_cents: int = 0,
+    ) -> bool:
+        # increments happen in SQL so concurrent writers cannot lose updates;
+        # payments are refused here if they would overpay the current balance
+        new_total = cls.total_cents + total_cents
+        new_paid = cls.paid_cents + paid_cents
+        statement = (
+            update(cls)
+            .where(cls.id == bill_id)
+            .values(
+                total_cents=new_total,
+                paid_cents=new_paid,
+                status=cls._status_for(new_total, new_paid),
+            )
+            .execution_options(synchronize_session="fetch")
+        )
+        if paid_cents > 0:
+            statement = statement.where(new_paid <= new_total)
+        return db.execute(statement).rowcount > 0
+
+    @classmethod
+    def _repair_balances_statement(cls):
+        line_cents = (
+            select(func.coalesce(func.sum(cast(func.round(BillLineItem.amount * 100), Integer)), 0))
+            .where(BillLineItem.bill_id == cls.id)
+            .scalar_subquery()
+        )
+        paid_cents = (
+            select(func.coalesce(func.sum(cast(func.round(Payment.amount * 100), Integer)), 0))
+            .where(Payment.bill_id == cls.id, Payment.status == "completed")
+            .scalar_subquery()
+        )
+        status = cls._status_for(line_cents, paid_cents)
+        return (
+            update(cls.__table__)
+            .where(
+                (cls.total_cents != line_cents)
+                | (cls.paid_cents != paid_cents)
+                | (cls.status != status)
+            )
+            .values(total_cents=line_cents, paid_cents=paid_cents, status=status)
+        )
+
+    @classmethod
+    def reconcile_balances(cls, db: "OrmSession", commit: bool = True) -> int:
+        repaired = db.execute(cls._repair_balances_statement()).rowcount
+        if commit:
+            db.commit()
+        return repaired
 
     @classmethod
     def create(cls, db: "OrmSession", member_id: int) -> "Bill":
@@ -76,30 +183,63 @@ class Payment(Base):
     amount = Column(Float, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     status = Column(String, nullable=False, default="pending")
-    transaction_code = Column(Integer, nullable=False)
+    transaction_code = Column(BigInteger, nullable=False, unique=True, index=True)
 
     bill = relationship("Bill", back_populates="payments")
 
     @classmethod
-    def record(cls, db: "OrmSession", bill: Bill, amount: float) -> "Payment":
+    def new_transaction_code(cls) -> int:
+        return next_transaction_code()
+
+    @classmethod
+    def get_by_transaction_code(cls, db: "OrmSession", transaction_code: int) -> "Payment | None":
+        return db.query(cls).filter(cls.transaction_code == transaction_code).first()
+
+    @classmethod
+    def record(cls, db: "OrmSession", bill: Bill, amount: float, commit: bool = True) -> "Payment":
+        # the payment insert and the balance/status update share one transaction;
+        # with commit=False the caller decides when it ends (e.g. every N imports)
         if bill.amount_due <= 0:
             raise ValueError("Bill is already fully paid.")
-        
-        if amount <= 0:
+
+        # stored already rounded, so reconcile_balances() sums the same cents
+        cents = to_cents(amount)
+        amount = cents / 100
+
+        if cents <= 0:
             raise ValueError("Payment amount must be positive.")
 
         if amount > bill.amount_due:
              raise ValueError(f"Payment amount ({amount}) exceeds amount due ({bill.amount_due}).")
 
+        if not Bill.apply_balance_delta(db, bill.id, paid_cents=cents):
+            raise ValueError("Payment amount exceeds amount due.")
+
         payment = cls(
             bill_id=bill.id,
             amount=amount,
             status="completed",
-            transaction_code=randint(1000, 9999)
+            transaction_code=cls.new_transaction_code()
         )
 
-        db.add(payment)
-        db.commit()
-        db.refresh(payment)
-        bill.update_status(db)
+        # a code can only clash with one from another process on the same node
+        # id; retry under a savepoint so the balance update above is kept
+        for attempt in range(CODE_ATTEMPTS):
+            try:
+                with db.begin_nested():
+                    db.add(payment)
+                    db.flush()
+                break
+            except IntegrityError as exc:
+                if "transaction_code" not in str(exc.orig) or attempt == CODE_ATTEMPTS - 1:
+                    raise
+                payment = cls(
+                    bill_id=bill.id,
+                    amount=amount,
+                    status="completed",
+                    transaction_code=cls.new_transaction_code()
+                )
+
+        if commit:
+            db.commit()
         return payment
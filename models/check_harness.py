@@ -0,0 +1,77 @@
+from contextlib import contextmanager
+from datetime import time
+from sqlalchemy import event
+from sqlalchemy.orm import Session as OrmSession
+
+
+def private_engine():
+    """A migrated in-memory database for the check commands."""
+    from database import create_db_engine
+    from migrations import init_db
+
+    # always a private in-memory database, whatever HEALTH_CLUB_DB_URL says
+    engine = create_db_engine("test", url="sqlite://")
+    init_db(engine)
+    return engine
+
+
+def seed(db: "OrmSession", rows: int = 1) -> dict:
+    """One class with an enrolled member, plus `rows` trainers with a window and
+    `rows` bills with a line item and a payment each."""
+    from billing import Bill, BillLineItem, Payment
+    from enrollment import Enrollment
+    from fitness_class import FitnessClass
+    from member import Member
+    from room import Room
+    from trainer import Trainer
+    from trainer_availability import TrainerAvailability
+
+    trainers = [Trainer(name="Plan Trainer", email="trainer@example.com")]
+    trainers += [Trainer(name=f"Plan Trainer {i}", email=f"trainer{i}@example.com") for i in range(1, rows)]
+    member = Member(name="Plan Member", email="member@example.com")
+    room = Room(name="Plan Room", capacity=10)
+    db.add_all([*trainers, member, room])
+    db.flush()
+
+    db.add_all(
+        TrainerAvailability(trainer_id=trainer.id, day_of_week=1, start_time=time(8), end_time=time(20))
+        for trainer in trainers
+    )
+    fitness_class = FitnessClass(
+        name="Plan Class",
+        trainer_id=trainers[0].id,
+        room_id=room.id,
+        day_of_week=1,
+        start_time=time(9),
+        end_time=time(10),
+        capacity=10,
+    )
+    bills = [Bill(member_id=member.id, status="pending") for _ in range(rows)]
+    db.add_all([fitness_class, *bills])
+    db.flush()
+
+    db.add(Enrollment(member_id=member.id, class_id=fitness_class.id))
+    for code, bill in enumerate(bills, start=1):
+        db.add_all(
+            [
+                BillLineItem(bill_id=bill.id, description="Plan", amount=10.0),
+                Payment(bill_id=bill.id, amount=1.0, status="completed", transaction_code=code),
+            ]
+        )
+    db.commit()
+    return {"trainer": trainers[0], "member": member, "room": room, "class": fitness_class, "bill": bills[0]}
+
+
+@contextmanager
+def captured_statements(engine):
+    """Collect (statement, parameters, executemany) for everything run on engine."""
+    statements = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters, executemany))
+
+    event.listen(engine, "before_cursor_execute", _capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", _capture)
@@ -0,0 +1,176 @@
+from datetime import date, datetime, timedelta
+from sqlalchemy import Boolean, Column, Date, DateTime, ForeignKey, Index, Integer, String, UniqueConstraint, select
+from sqlalchemy.orm import Session as OrmSession
+from user import Base
+from room import Room
+from fitness_class import FitnessClass
+
+
+class ClassException(Base):
+    """A one-off change to a single dated session of a recurring class.
+
+    Sessions themselves are never stored: they are expanded from
+    FitnessClass.day_of_week on demand, and only cancellations and room swaps
+    get a row here.
+    """
+
+    __tablename__ = "class_exceptions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    class_id = Column(Integer, ForeignKey("classes.id"), nullable=False)
+    occurs_on = Column(Date, nullable=False)
+    cancelled = Column(Boolean, nullable=False, default=False)
+    room_id = Column(Integer, ForeignKey("rooms.id"), nullable=True)
+    note = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    # range scans by date for iter_occurrences; the unique constraint's index
+    # serves the per-session lookups
+    __table_args__ = (
+        UniqueConstraint("class_id", "occurs_on", name="uq_class_exceptions_session"),
+        Index("ix_class_exceptions_date", "occurs_on"),
+    )
+
+    @classmethod
+    def _session(cls, db: "OrmSession", class_id: int, occurs_on: date) -> tuple[FitnessClass, "ClassException"]:
+        fitness_class = db.query(FitnessClass).filter(FitnessClass.id == class_id).first()
+        if fitness_class is None:
+            raise ValueError("Class not found")
+        if occurs_on.isoweekday() != fitness_class.day_of_week:
+            raise ValueError(f"{fitness_class.name} does not run on {occurs_on.isoformat()}.")
+        exception = (
+            db.query(cls)
+            .filter(cls.class_id == class_id, cls.occurs_on == occurs_on)
+            .first()
+        )
+        if exception is None:
+            exception = cls(class_id=class_id, occurs_on=occurs_on)
+        return fitness_class, exception
+
+    @classmethod
+    def cancel(cls, db: "OrmSession", class_id: int, occurs_on: date, note: str | None = None) -> "ClassException":
+        _, exception = cls._session(db, class_id, occurs_on)
+        exception.cancelled = True
+        exception.note = note if note is not None else exception.note
+        db.add(exception)
+        db.commit()
+        db.refresh(exception)
+        return exception
+
+    @classmethod
+    def swap_room(
+        cls,
+        db: "OrmSession",
+        class_id: int,
+        occurs_on: date,
+        room_id: int,
+        note: str | None = None,
+    ) -> "ClassException":
+        fitness_class, exception = cls._session(db, class_id, occurs_on)
+        room = db.query(Room).filter(Room.id == room_id).first()
+        if room is None:
+            raise ValueError("Room not found.")
+        if room.capacity is not None and fitness_class.capacity is not None and fitness_class.capacity > room.capacity:
+            raise ValueError(f"Class capacity exceeds room capacity ({room.capacity}).")
+        if cls._room_taken(db, room_id, occurs_on, fitness_class):
+            raise ValueError("Room is booked for another class at that time.")
+
+        exception.cancelled = False
+        exception.room_id = room_id
+        exception.note = note if note is not None else exception.note
+        db.add(exception)
+        db.commit()
+        db.refresh(exception)
+        return exception
+
+    @classmethod
+    def restore(cls, db: "OrmSession", class_id: int, occurs_on: date) -> bool:
+        _, exception = cls._session(db, class_id, occurs_on)
+        if exception.id is None:
+            return False
+        db.delete(exception)
+        db.commit()
+        return True
+
+    @classmethod
+    def _room_taken(cls, db: "OrmSession", room_id: int, occurs_on: date, fitness_class: FitnessClass) -> bool:
+        overlaps = (
+            (FitnessClass.id != fitness_class.id)
+            & (FitnessClass.day_of_week == fitness_class.day_of_week)
+            & (FitnessClass.start_time < fitness_class.end_time)
+            & (FitnessClass.end_time > fitness_class.start_time)
+        )
+        # that day's exceptions decide where each overlapping class really is
+        moved = {
+            class_id: (cancelled, swapped_room)
+            for class_id, cancelled, swapped_room in db.execute(
+                select(cls.class_id, cls.cancelled, cls.room_id).where(cls.occurs_on == occurs_on)
+            )
+        }
+        for other_id, other_room in db.execute(select(FitnessClass.id, FitnessClass.room_id).where(overlaps)):
+            cancelled, swapped_room = moved.get(other_id, (False, None))
+            if not cancelled and (swapped_room or other_room) == room_id:
+                return True
+        return False
+
+
+def iter_occurrences(db: "OrmSession", start: date, end: date, class_ids=None):
+    """Yield one dict per dated session in [start, end], by date then start time.
+
+    Two queries run up front (the weekly classes and the exceptions in range);
+    sessions are then produced day by day, so callers can stop early. An
+    exception left on a date the class no longer runs on is simply never hit.
+    """
+    query = select(
+        FitnessClass.id,
+        FitnessClass.name,
+        FitnessClass.day_of_week,
+        FitnessClass.start_time,
+        FitnessClass.end_time,
+        FitnessClass.trainer_id,
+        FitnessClass.room_id,
+        FitnessClass.capacity,
+    ).order_by(FitnessClass.day_of_week, FitnessClass.start_time, FitnessClass.id)
+    exception_query = select(ClassException).where(ClassException.occurs_on.between(start, end))
+    if class_ids is not None:
+        query = query.where(FitnessClass.id.in_(class_ids))
+        exception_query = exception_query.where(ClassException.class_id.in_(class_ids))
+
+    classes_by_day = {}
+    for row in db.execute(query).mappings():
+        classes_by_day.setdefault(row["day_of_week"], []).append(row)
+    exceptions = {
+        (exception.class_id, exception.occurs_on): exception
+        for exception in db.scalars(exception_query)
+    }
+
+    day = start
+    while day <= end:
+        for row in classes_by_day.get(day.isoweekday(), ()):
+            exception = exceptions.get((row["id"], day))
+            room_id = row["room_id"]
+            status = "scheduled"
+            if exception is not None:
+                if exception.cancelled:
+                    status = "cancelled"
+                elif exception.room_id is not None:
+                    room_id = exception.room_id
+                    status = "room_changed"
+            yield {
+                "class_id": row["id"],
+                "name": row["name"],
+                "date": day,
+                "start_time": row["start_time"],
+                "end_time": row["end_time"],
+                "trainer_id": row["trainer_id"],
+                "room_id": room_id,
+                "capacity": row["capacity"],
+                "status": status,
+                "note": None if exception is None else exception.note,
+            }
+        day += timedelta(days=1)
+
+
+def upcoming_occurrences(db: "OrmSession", days: int = 30, class_ids=None, today: date | None = None):
+    today = today or date.today()
+    return iter_occurrences(db, today, today + timedelta(days=days - 1), class_ids=class_ids)
@@ -0,0 +1,64 @@
+from ttl_cache import TtlLruCache
+
+PROFILE_FIELDS = ("name", "email", "age", "gender", "current_weight", "weight_goal")
+
+
+def class_entry(fitness_class) -> dict:
+    return {
+        "session_id": fitness_class.id,
+        "day_of_week": fitness_class.day_of_week,
+        "start_time": fitness_class.start_time,
+        "end_time": fitness_class.end_time,
+        "session_type": "group_class",
+        "name": fitness_class.name,
+    }
+
+
+def _timetable_order(entry: dict) -> tuple:
+    return (entry["day_of_week"], entry["start_time"], entry["session_id"])
+
+
+def _copy(dashboard: dict) -> dict:
+    copied = dict(dashboard)
+    copied["enrolled_classes"] = [dict(entry) for entry in dashboard["enrolled_classes"]]
+    return copied
+
+
+class DashboardCache(TtlLruCache):
+    """LRU + TTL cache of Member.get_dashboard() results keyed by member id.
+
+    Entries are tagged with the class ids they list, so a class edit patches
+    only the dashboards that show it. Callers always get a copy, so nothing
+    they do to it leaks back into the cache.
+    """
+
+    def _export(self, dashboard: dict) -> dict:
+        return _copy(dashboard)
+
+    def get(self, member_id: int) -> dict | None:
+        return self.lookup(member_id)
+
+    def put(self, member_id: int, dashboard: dict) -> None:
+        self.store(
+            member_id,
+            _copy(dashboard),
+            tags=[session["session_id"] for session in dashboard["enrolled_classes"]],
+        )
+
+    def patch_profile(self, member_id: int, profile: dict) -> None:
+        with self._lock:
+            dashboard = self._value(member_id)
+            if dashboard is not None:
+                dashboard.update((field, profile[field]) for field in PROFILE_FIELDS if field in profile)
+
+    def patch_class(self, fitness_class) -> None:
+        # a class edit rewrites that class in every cached dashboard listing it
+        updated = class_entry(fitness_class)
+        with self._lock:
+            for member_id in self._tagged(fitness_class.id):
+                sessions = self._value(member_id)["enrolled_classes"]
+                sessions[:] = [updated if s["session_id"] == updated["session_id"] else s for s in sessions]
+                sessions.sort(key=_timetable_order)
+
+
+dashboard_cache = DashboardCache()
@@ -0,0 +1,77 @@
+import os
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool, StaticPool
+
+DEFAULT_URL = "sqlite:///health_club.db"
+
+# pragmas are applied to every new DBAPI connection, in order
+PROFILES = {
+    # single user at a terminal: stock journaling, just wait instead of failing on locks
+    "dev": {
+        "url": DEFAULT_URL,
+        "pragmas": {
+            "busy_timeout": 5000,
+        },
+        "pool": {"poolclass": QueuePool, "pool_size": 2, "max_overflow": 2},
+    },
+    # concurrent readers and one writer at a time without "database is locked"
+    "prod-wal": {
+        "url": DEFAULT_URL,
+        "pragmas": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "busy_timeout": 10000,
+            "cache_size": -65536,
+            "temp_store": "MEMORY",
+            "mmap_size": 268435456,
+        },
+        "pool": {"poolclass": QueuePool, "pool_size": 8, "max_overflow": 16, "pool_pre_ping": True},
+    },
+    # one shared in-memory database for every thread of a test run
+    "test": {
+        "url": "sqlite://",
+        "pragmas": {},
+        "pool": {"poolclass": StaticPool},
+    },
+}
+
+
+def create_db_engine(
+    profile: str | None = None,
+    url: str | None = None,
+    mmap_size: int | None = None,
+    echo: bool = False,
+) -> Engine:
+    """Build an engine from a named profile.
+
+    profile, url and mmap_size fall back to the HEALTH_CLUB_DB_PROFILE,
+    HEALTH_CLUB_DB_URL and HEALTH_CLUB_DB_MMAP_SIZE environment variables.
+    """
+    profile = profile or os.environ.get("HEALTH_CLUB_DB_PROFILE", "dev")
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown database profile: {profile}")
+    settings = PROFILES[profile]
+
+    url = url or os.environ.get("HEALTH_CLUB_DB_URL") or settings["url"]
+    pragmas = dict(settings["pragmas"])
+    if mmap_size is None and os.environ.get("HEALTH_CLUB_DB_MMAP_SIZE"):
+        mmap_size = int(os.environ["HEALTH_CLUB_DB_MMAP_SIZE"])
+    if mmap_size is not None:
+        pragmas["mmap_size"] = mmap_size
+
+    engine = create_engine(
+        url,
+        echo=echo,
+        connect_args={"check_same_thread": False},
+        **settings["pool"],
+    )
+
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    return engine
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, DateTime, ForeignKey, PrimaryKeyConstraint
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, PrimaryKeyConstraint, DDL, event
 from user import Base
 
 
@@ -14,3 +14,38 @@ class Enrollment(Base):
         PrimaryKeyConstraint('member_id', 'class_id', name='pk_enrollment'),
     )
 
+
+# classes.enrolled_count is maintained by the database so the capacity check and
+# the insert happen in one statement, whichever connection or process writes
+ENROLLMENT_TRIGGERS = (
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS trg_enrollments_capacity "
+        "BEFORE INSERT ON enrollments "
+        "BEGIN "
+        "SELECT RAISE(ABORT, 'Class is at full capacity') FROM classes "
+        "WHERE id = NEW.class_id AND capacity IS NOT NULL AND enrolled_count >= capacity "
+        # a duplicate is left for the primary key to reject as one
+        "AND NOT EXISTS (SELECT 1 FROM enrollments "
+        "WHERE member_id = NEW.member_id AND class_id = NEW.class_id); "
+        "END"
+    ),
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS trg_enrollments_count_insert "
+        "AFTER INSERT ON enrollments "
+        "BEGIN "
+        "UPDATE classes SET enrolled_count = enrolled_count + 1 WHERE id = NEW.class_id; "
+        "END"
+    ),
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS trg_enrollments_count_delete "
+        "AFTER DELETE ON enrollments "
+        "BEGIN "
+        "UPDATE classes SET enrolled_count = enrolled_count - 1 WHERE id = OLD.class_id; "
+        "END"
+    ),
+)
+
+CAPACITY_TRIGGER = ENROLLMENT_TRIGGERS[0]
+
+for _trigger in ENROLLMENT_TRIGGERS:
+    event.listen(Enrollment.__table__, "after_create", _trigger.execute_if(dialect="sqlite"))
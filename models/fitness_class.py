@@ -1,9 +1,13 @@
 from datetime import time
-from sqlalchemy import Column, Integer, String, Time, ForeignKey
-from sqlalchemy.orm import relationship, Session as OrmSession
+from sqlalchemy import DDL, Column, Index, Integer, String, Time, ForeignKey, case, event, insert, or_, text, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import Query, relationship, Session as OrmSession
 from user import Base, User
 from room import Room
 from trainer_availability import TrainerAvailability
+from schedule_index import CLASS_SLOT_TRIGGERS, ScheduleIndex, slot_version
+from dashboard_cache import dashboard_cache
 
 
 class FitnessClass(Base):
@@ -17,10 +21,161 @@ class FitnessClass(Base):
     start_time = Column(Time, nullable=False)
     end_time = Column(Time, nullable=False)
     capacity = Column(Integer, nullable=True)
+    enrolled_count = Column(Integer, nullable=False, default=0, server_default=text("0"))
 
     trainer = relationship("User")
     room = relationship("Room")
 
+    # composite indexes for the conflict checks in _check_slot and the timetable
+    # ordering in iter_page; the slot indexes cover the id-only conflict queries
+    __table_args__ = (
+        Index("ix_classes_trainer_slot", "trainer_id", "day_of_week", "start_time", "end_time"),
+        Index("ix_classes_room_slot", "room_id", "day_of_week", "start_time", "end_time"),
+        Index("ix_classes_timetable", "day_of_week", "start_time"),
+    )
+
+    # enrolled_count is kept in step with enrollments by the SQLite triggers, so
+    # seat counts never need a COUNT(*) per class or a GROUP BY
+    @hybrid_property
+    def seats_left(self) -> int | None:
+        if self.capacity is None:
+            return None
+        return max(self.capacity - (self.enrolled_count or 0), 0)
+
+    @seats_left.expression
+    def seats_left(cls):
+        return case(
+            (cls.capacity.is_(None), None),
+            (cls.enrolled_count >= cls.capacity, 0),
+            else_=cls.capacity - cls.enrolled_count,
+        )
+
+    @hybrid_property
+    def has_open_seats(self) -> bool:
+        return self.capacity is None or (self.enrolled_count or 0) < self.capacity
+
+    @has_open_seats.expression
+    def has_open_seats(cls):
+        return or_(cls.capacity.is_(None), cls.enrolled_count < cls.capacity)
+
+    @classmethod
+    def with_seat_counts(
+        cls,
+        db: "OrmSession",
+        seats_only: bool = False,
+        after_key: tuple | None = None,
+    ) -> Query:
+        # rows of (FitnessClass, enrolled_count, seats_left) in timetable order;
+        # seats_left is None for classes without a capacity
+        query = db.query(
+            cls,
+            cls.enrolled_count.label("enrolled_count"),
+            cls.seats_left.label("seats_left"),
+        )
+        if seats_only:
+            query = query.filter(cls.has_open_seats)
+        if after_key is not None:
+            query = query.filter(tuple_(cls.day_of_week, cls.start_time, cls.id) > tuple_(*after_key))
+        return query.order_by(cls.day_of_week, cls.start_time, cls.id)
+
+    @classmethod
+    def iter_page(
+        cls,
+        db: "OrmSession",
+        after_key: tuple | None = None,
+        limit: int = 50,
+    ) -> list["FitnessClass"]:
+        # timetable order; after_key is page_key() of the last class already shown
+        query = db.query(cls)
+        if after_key is not None:
+            query = query.filter(tuple_(cls.day_of_week, cls.start_time, cls.id) > tuple_(*after_key))
+        return query.order_by(cls.day_of_week, cls.start_time, cls.id).limit(limit).all()
+
+    def page_key(self) -> tuple:
+        return (self.day_of_week, self.start_time, self.id)
+
+    @classmethod
+    def _overlapping(cls, db: "OrmSession", day_of_week: int, start_time: time, end_time: time, exclude_id: int | None = None):
+        query = db.query(cls.id).filter(
+            cls.day_of_week == day_of_week,
+            cls.start_time < end_time,
+            cls.end_time > start_time,
+        )
+        if exclude_id is not None:
+            query = query.filter(cls.id != exclude_id)
+        return query
+
+    @classmethod
+    def _check_slot(
+        cls,
+        db: "OrmSession",
+        trainer_id: int,
+        room_id: int | None,
+        day_of_week: int,
+        start_time: time,
+        end_time: time,
+        exclude_id: int | None = None,
+    ) -> int | None:
+        # a current index answers without touching the tables; None from it means
+        # it cannot vouch for the answer and the range query decides. Returns the
+        # slot_version the index answered at, if it did
+        index = ScheduleIndex.current(db)
+        checked_version = None if index is None else index.version
+
+        available = None if index is None else index.trainer_available(trainer_id, day_of_week, start_time, end_time)
+        if available is None:
+            available = (
+                db.query(TrainerAvailability.id)
+                .filter(
+                    TrainerAvailability.trainer_id == trainer_id,
+                    TrainerAvailability.day_of_week == day_of_week,
+                    TrainerAvailability.start_time <= start_time,
+                    TrainerAvailability.end_time >= end_time,
+                )
+                .first()
+            ) is not None
+
+        if not available:
+            raise ValueError("Trainer is not available for the requested time window.")
+
+        trainer_busy = (
+            None if index is None else index.trainer_busy(trainer_id, day_of_week, start_time, end_time, exclude_id)
+        )
+        if trainer_busy is None:
+            trainer_busy = (
+                cls._overlapping(db, day_of_week, start_time, end_time, exclude_id)
+                .filter(cls.trainer_id == trainer_id)
+                .first()
+            ) is not None
+
+        if trainer_busy:
+            raise ValueError("Trainer is already assigned to another class in that time window.")
+
+        if room_id is not None:
+            room_busy = (
+                None if index is None else index.room_busy(room_id, day_of_week, start_time, end_time, exclude_id)
+            )
+            if room_busy is None:
+                room_busy = (
+                    cls._overlapping(db, day_of_week, start_time, end_time, exclude_id)
+                    .filter(cls.room_id == room_id)
+                    .first()
+                ) is not None
+
+            if room_busy:
+                raise ValueError("Room is booked for another class in that time window.")
+
+        return checked_version
+
+    @staticmethod
+    def capacity_for_room(capacity: int | None, room_capacity: int | None) -> int | None:
+        # a class placed in a room defaults to the room's capacity and may not exceed it
+        if capacity is None:
+            return room_capacity
+        if room_capacity is not None and capacity > room_capacity:
+            raise ValueError(f"Capacity cannot exceed room capacity ({room_capacity}).")
+        return capacity
+
     @classmethod
     def schedule(
         cls,
@@ -39,48 +194,13 @@ class FitnessClass(Base):
         if not (1 <= day_of_week <= 7):
             raise ValueError("day_of_week must be between 1 and 7")
 
-        availability = (
-            db.query(TrainerAvailability)
-            .filter(
-                TrainerAvailability.trainer_id == trainer_id,
-                TrainerAvailability.day_of_week == day_of_week,
-                TrainerAvailability.start_time <= start_time,
-                TrainerAvailability.end_time >= end_time,
-            )
-            .first()
-        )
-
-        if availability is None:
-            raise ValueError("Trainer is not available for the requested time window.")
-
-        conflict_class = (
-            db.query(cls)
-            .filter(
-                cls.trainer_id == trainer_id,
-                cls.day_of_week == day_of_week,
-                cls.start_time < end_time,
-                cls.end_time > start_time,
-            )
-            .first()
-        )
-
-        if conflict_class is not None:
-            raise ValueError("Trainer is already assigned to another class in that time window.")
-
         if room_id is not None:
-            room_conflict_class = (
-                db.query(cls)
-                .filter(
-                    cls.room_id == room_id,
-                    cls.day_of_week == day_of_week,
-                    cls.start_time < end_time,
-                    cls.end_time > start_time,
-                )
-                .first()
-            )
+            room = db.query(Room.capacity).filter(Room.id == room_id).first()
+            if room is None:
+                raise ValueError("Room not found.")
+            capacity = cls.capacity_for_room(capacity, room.capacity)
 
-            if room_conflict_class is not None:
-                raise ValueError("Room is booked for another class in that time window.")
+        checked_version = cls._check_slot(db, trainer_id, room_id, day_of_week, start_time, end_time)
 
         obj = cls(
             name=name,
@@ -93,7 +213,16 @@ class FitnessClass(Base):
         )
 
         db.add(obj)
+        db.flush()
+        # read inside the write transaction, so no other writer can move it
+        # before the commit
+        version = None if checked_version is None else slot_version(db)
+        class_id = obj.id
         db.commit()
+        if checked_version is not None:
+            ScheduleIndex.class_added(
+                db, checked_version, version, class_id, trainer_id, room_id, day_of_week, start_time, end_time
+            )
         db.refresh(obj)
         return obj
 
@@ -129,60 +258,183 @@ class FitnessClass(Base):
         if not (1 <= new_day_of_week <= 7):
             raise ValueError("day_of_week must be between 1 and 7")
 
-        availability = (
-            db.query(TrainerAvailability)
-            .filter(
-                TrainerAvailability.trainer_id == new_trainer_id,
-                TrainerAvailability.day_of_week == new_day_of_week,
-                TrainerAvailability.start_time <= new_start_time,
-                TrainerAvailability.end_time >= new_end_time,
-            )
-            .first()
-        )
+        if new_room_id is not None:
+            room = db.query(Room.capacity).filter(Room.id == new_room_id).first()
+            if room is None:
+                raise ValueError("Room not found.")
+            new_capacity = cls.capacity_for_room(new_capacity, room.capacity)
 
-        if availability is None:
-            raise ValueError("Trainer is not available for the requested time window.")
+        # enrolled_count is the trigger-maintained counter, so this needs no COUNT(*);
+        # CAPACITY_GUARD catches a registration that lands after this check
+        if new_capacity is not None and new_capacity < obj.enrolled_count:
+            raise ValueError(f"Capacity cannot be lower than current enrollment ({obj.enrolled_count}).")
 
-        conflict_class = (
-            db.query(cls)
-            .filter(
-                cls.id != obj.id,
-                cls.trainer_id == new_trainer_id,
-                cls.day_of_week == new_day_of_week,
-                cls.start_time < new_end_time,
-                cls.end_time > new_start_time,
-            )
-            .first()
+        cls._check_slot(
+            db,
+            new_trainer_id,
+            new_room_id,
+            new_day_of_week,
+            new_start_time,
+            new_end_time,
+            exclude_id=obj.id,
         )
 
-        if conflict_class is not None:
-            raise ValueError("Trainer is already assigned to another class in that time window.")
-
-        if new_room_id is not None:
-            room_conflict_class = (
-                db.query(cls)
-                .filter(
-                    cls.id != obj.id,
-                    cls.room_id == new_room_id,
-                    cls.day_of_week == new_day_of_week,
-                    cls.start_time < new_end_time,
-                    cls.end_time > new_start_time,
-                )
-                .first()
-            )
-
-            if room_conflict_class is not None:
-                raise ValueError("Room is booked for another class in that time window.")
-
         obj.name = new_name
         obj.trainer_id = new_trainer_id
         obj.room_id = new_room_id
         obj.day_of_week = new_day_of_week
         obj.start_time = new_start_time
         obj.end_time = new_end_time
+        capacity_raised = obj.capacity is not None and new_capacity is not None and new_capacity > obj.capacity
         obj.capacity = new_capacity
 
         db.add(obj)
-        db.commit()
+        if capacity_raised:
+            from waitlist import WaitlistEntry
+
+            # the new seats go to the waitlist in the same transaction
+            db.flush()
+            WaitlistEntry.promote(db, obj.id, commit=False)
+        try:
+            db.commit()
+        except IntegrityError as exc:
+            db.rollback()
+            if "Capacity cannot be lower than current enrollment" in str(exc.orig):
+                raise ValueError("Capacity cannot be lower than current enrollment.")
+            raise
         db.refresh(obj)
+        dashboard_cache.patch_class(obj)
         return obj
+
+    @classmethod
+    def schedule_bulk(
+        cls,
+        db: "OrmSession",
+        rows,
+        all_or_nothing: bool = False,
+    ) -> tuple[list[int], list[tuple[int, str]]]:
+        rows = [dict(row) for row in rows]
+
+        trainer_ids = {row.get("trainer_id") for row in rows}
+        room_ids = {row.get("room_id") for row in rows if row.get("room_id") is not None}
+        known_trainers = {
+            trainer_id
+            for (trainer_id,) in db.query(User.id).filter(
+                User.user_type == "trainer",
+                User.id.in_(trainer_ids),
+            )
+        }
+        room_capacities = dict(db.query(Room.id, Room.capacity).filter(Room.id.in_(room_ids)))
+
+        # stored classes and windows the batch can collide with, loaded up front
+        # so rows are validated in memory instead of with three queries each
+        days = {row.get("day_of_week") for row in rows if row.get("day_of_week") is not None}
+        stored = ScheduleIndex.for_batch(db, days, known_trainers, set(room_capacities))
+        # classes accepted earlier in this batch, so rows are also checked against each other
+        batch = ScheduleIndex()
+        valid = []
+        errors = []
+
+        for position, row in enumerate(rows):
+            try:
+                values = cls._validate_bulk_row(db, row, known_trainers, room_capacities, stored, batch)
+            except ValueError as exc:
+                errors.append((position, str(exc)))
+                continue
+            batch.put_class(
+                position,
+                values["trainer_id"],
+                values["room_id"],
+                values["day_of_week"],
+                values["start_time"],
+                values["end_time"],
+            )
+            valid.append(values)
+
+        if not valid or (errors and all_or_nothing):
+            return [], errors
+
+        class_ids = list(
+            db.scalars(
+                insert(cls).returning(cls.id, sort_by_parameter_order=True),
+                valid,
+            )
+        )
+        db.commit()
+        return class_ids, errors
+
+    @classmethod
+    def _validate_bulk_row(
+        cls,
+        db: "OrmSession",
+        row: dict,
+        known_trainers: set,
+        room_capacities: dict,
+        stored: ScheduleIndex,
+        batch: ScheduleIndex,
+    ) -> dict:
+        for field in ("name", "trainer_id", "day_of_week", "start_time", "end_time"):
+            if row.get(field) is None:
+                raise ValueError(f"{field} is required")
+
+        values = {
+            "name": row["name"],
+            "trainer_id": row["trainer_id"],
+            "room_id": row.get("room_id"),
+            "day_of_week": row["day_of_week"],
+            "start_time": row["start_time"],
+            "end_time": row["end_time"],
+            "capacity": row.get("capacity"),
+        }
+
+        if values["end_time"] <= values["start_time"]:
+            raise ValueError("end_time must be after start_time")
+
+        if not (1 <= values["day_of_week"] <= 7):
+            raise ValueError("day_of_week must be between 1 and 7")
+
+        if values["trainer_id"] not in known_trainers:
+            raise ValueError("Trainer not found.")
+
+        if values["room_id"] is not None:
+            if values["room_id"] not in room_capacities:
+                raise ValueError("Room not found.")
+            values["capacity"] = cls.capacity_for_room(values["capacity"], room_capacities[values["room_id"]])
+
+        slot = (values["day_of_week"], values["start_time"], values["end_time"])
+        if batch.trainer_busy(values["trainer_id"], *slot):
+            raise ValueError("Trainer is already assigned to another class in this batch.")
+        if values["room_id"] is not None and batch.room_busy(values["room_id"], *slot):
+            raise ValueError("Room is booked for another class in this batch.")
+
+        available = stored.trainer_available(values["trainer_id"], *slot)
+        trainer_busy = stored.trainer_busy(values["trainer_id"], *slot)
+        room_busy = False if values["room_id"] is None else stored.room_busy(values["room_id"], *slot)
+        if None in (available, trainer_busy, room_busy):
+            # the stored rows already overlap, so the range queries decide
+            cls._check_slot(db, values["trainer_id"], values["room_id"], *slot)
+            return values
+
+        if not available:
+            raise ValueError("Trainer is not available for the requested time window.")
+        if trainer_busy:
+            raise ValueError("Trainer is already assigned to another class in that time window.")
+        if room_busy:
+            raise ValueError("Room is booked for another class in that time window.")
+        return values
+
+
+# the capacity counterpart of the enrollment triggers: a capacity below the
+# current enrollment is refused whichever connection writes it
+CAPACITY_GUARD = DDL(
+    "CREATE TRIGGER IF NOT EXISTS trg_classes_capacity_floor "
+    "BEFORE UPDATE OF capacity ON classes "
+    "WHEN NEW.capacity IS NOT NULL AND NEW.capacity < OLD.enrolled_count "
+    "BEGIN "
+    "SELECT RAISE(ABORT, 'Capacity cannot be lower than current enrollment'); "
+    "END"
+)
+
+event.listen(FitnessClass.__table__, "after_create", CAPACITY_GUARD.execute_if(dialect="sqlite"))
+for _ddl in CLASS_SLOT_TRIGGERS:
+    event.listen(FitnessClass.__table__, "after_create", _ddl.execute_if(dialect="sqlite"))
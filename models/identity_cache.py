@@ -0,0 +1,45 @@
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached, Session as OrmSession
+from ttl_cache import TtlLruCache
+
+
+def email_key(user_type: str, email: str) -> tuple:
+    # emails are matched exactly (that is what the unique index enforces)
+    return ("email", user_type, email.strip())
+
+
+def name_key(user_type: str, name: str) -> tuple:
+    return ("name", user_type, name.strip().lower())
+
+
+class IdentityCache(TtlLruCache):
+    """LRU + TTL cache of user rows for login and name lookups.
+
+    Entries are column snapshots, not ORM instances, so a hit can be attached
+    to any session with merge(load=False) and costs no SQL. Only writes in
+    this process invalidate entries; the TTL bounds staleness otherwise.
+    """
+
+    def get(self, db: "OrmSession", key: tuple):
+        entry = self.lookup(key)
+        if entry is None:
+            return None
+        cls, values = entry
+
+        existing = db.identity_map.get(inspect(cls).identity_key_from_primary_key((values["id"],)))
+        if existing is not None:
+            return existing
+        obj = cls(**values)
+        make_transient_to_detached(obj)
+        return db.merge(obj, load=False)
+
+    def put(self, key: tuple, obj) -> None:
+        mapper = inspect(obj).mapper
+        values = {attr.key: getattr(obj, attr.key) for attr in mapper.column_attrs}
+        self.store(key, (type(obj), values), tags=(values["id"],))
+
+    def invalidate_user(self, user_id: int) -> None:
+        self.invalidate_tag(user_id)
+
+
+identity_cache = IdentityCache()
@@ -1,10 +1,13 @@
 from datetime import datetime
-from sqlalchemy import Column, Float, Integer, String, func
+from sqlalchemy import Column, Float, Integer, String, delete, insert, literal, select
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session as OrmSession
+from sqlalchemy.orm import Session as OrmSession, make_transient_to_detached
 from user import User
+from identity_cache import email_key, identity_cache, name_key
+from dashboard_cache import PROFILE_FIELDS, class_entry, dashboard_cache
 from fitness_class import FitnessClass
 from enrollment import Enrollment
+from waitlist import WaitlistEntry
 
 
 class Member(User):
@@ -49,6 +52,9 @@ class Member(User):
                 raise ValueError("Email already registered")
             raise
 
+        identity_cache.invalidate(email_key("member", email))
+        if name:
+            identity_cache.invalidate(name_key("member", name))
         db.refresh(member_obj)
         return member_obj
 
@@ -74,88 +80,112 @@ class Member(User):
         
         db.add(self)
         db.commit()
+        identity_cache.invalidate_user(self.id)
         db.refresh(self)
+        dashboard_cache.patch_profile(self.id, {field: getattr(self, field) for field in PROFILE_FIELDS})
         return self
 
     def get_dashboard(
         self,
         db: "OrmSession",
     ) -> dict:
+        dashboard = dashboard_cache.get(self.id)
+        if dashboard is not None:
+            return dashboard
+
         enrolled_classes = (
             db.query(FitnessClass)
             .join(Enrollment, FitnessClass.id == Enrollment.class_id)
             .filter(
                 Enrollment.member_id == self.id,
             )
-            .order_by(FitnessClass.day_of_week, FitnessClass.start_time)
+            .order_by(FitnessClass.day_of_week, FitnessClass.start_time, FitnessClass.id)
             .all()
         )
         
-        return {
-            "name": self.name,
-            "email": self.email,
-            "age": self.age,
-            "gender": self.gender,
-            "current_weight": self.current_weight,
-            "weight_goal": self.weight_goal,
-            "enrolled_classes": [
-                {
-                    "session_id": session.id,
-                    "day_of_week": session.day_of_week,
-                    "start_time": session.start_time,
-                    "end_time": session.end_time,
-                    "session_type": "group_class",
-                    "name": session.name,
-                }
-                for session in enrolled_classes
-            ],
-        }
+        dashboard = {field: getattr(self, field) for field in PROFILE_FIELDS}
+        dashboard["enrolled_classes"] = [class_entry(session) for session in enrolled_classes]
+        dashboard_cache.put(self.id, dashboard)
+        return dashboard
 
     def register_for_class(
         self,
         db: "OrmSession",
         class_id: int,
     ) -> Enrollment:
-        session = (
-            db.query(FitnessClass)
-            .filter(
-                FitnessClass.id == class_id,
-            )
-            .first()
-        )
-        
-        if session is None:
-            raise ValueError("Class not found")
-        
-        existing = (
-            db.query(Enrollment)
-            .filter(
-                Enrollment.member_id == self.id,
-                Enrollment.class_id == class_id,
-            )
-            .first()
+        registered_at = datetime.utcnow()
+
+        # one guarded statement: the SELECT drops the row when the class does not
+        # exist, the primary key rejects duplicates and the capacity trigger
+        # rejects full classes, all under SQLite's write lock
+        statement = insert(Enrollment).from_select(
+            ["member_id", "class_id", "registration_date"],
+            select(literal(self.id), FitnessClass.id, literal(registered_at)).where(
+                FitnessClass.id == class_id
+            ),
         )
-        
-        if existing is not None:
-            raise ValueError("Already registered for this class")
-        
-        if session.capacity is not None:
-            current_enrollments = (
-                db.query(func.count(Enrollment.member_id))
-                .filter(Enrollment.class_id == class_id)
-                .scalar()
-            )
-            
-            if current_enrollments >= session.capacity:
+
+        try:
+            result = db.execute(statement)
+            if result.rowcount:
+                # a seat taken directly also ends any wait for it
+                WaitlistEntry.leave(db, self.id, class_id, commit=False)
+            db.commit()
+        except IntegrityError as exc:
+            db.rollback()
+            if "Class is at full capacity" in str(exc.orig):
                 raise ValueError("Class is at full capacity")
-        
+            if "enrollments.member_id" in str(exc.orig) or "UNIQUE constraint failed: enrollments" in str(exc.orig):
+                raise ValueError("Already registered for this class")
+            raise
+
+        if result.rowcount == 0:
+            raise ValueError("Class not found")
+        dashboard_cache.invalidate(self.id)
+
         enrollment = Enrollment(
             member_id=self.id,
             class_id=class_id,
-            registration_date=datetime.utcnow(),
+            registration_date=registered_at,
         )
-        
+        make_transient_to_detached(enrollment)
         db.add(enrollment)
-        db.commit()
-        db.refresh(enrollment)
         return enrollment
+
+    def unregister_from_class(
+        self,
+        db: "OrmSession",
+        class_id: int,
+    ) -> list[int]:
+        # the delete trigger decrements enrolled_count, and the freed seat goes to
+        # the head of the waitlist before anything commits; returns promoted member ids
+        result = db.execute(
+            delete(Enrollment).where(Enrollment.member_id == self.id, Enrollment.class_id == class_id)
+        )
+        if result.rowcount == 0:
+            db.rollback()
+            raise ValueError("Not registered for this class")
+        promoted = WaitlistEntry.promote(db, class_id, commit=False)
+        db.commit()
+        dashboard_cache.invalidate(self.id)
+        return promoted
+
+    def join_waitlist(
+        self,
+        db: "OrmSession",
+        class_id: int,
+    ) -> int:
+        return WaitlistEntry.join(db, self.id, class_id)
+
+    def leave_waitlist(
+        self,
+        db: "OrmSession",
+        class_id: int,
+    ) -> bool:
+        return WaitlistEntry.leave(db, self.id, class_id)
+
+    def get_waitlist_positions(
+        self,
+        db: "OrmSession",
+    ) -> list[tuple[int, str, int]]:
+        return WaitlistEntry.positions_for_member(db, self.id)
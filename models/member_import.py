@@ -0,0 +1,110 @@
+from time import perf_counter
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session as OrmSession
+from batching import chunks
+from identity_cache import identity_cache
+from member import Member
+
+
+def _optional(row: dict, field: str, convert):
+    value = (row.get(field) or "").strip()
+    if not value:
+        return None
+    try:
+        return convert(value)
+    except ValueError:
+        raise ValueError(f"{field} must be a number")
+
+
+def _parse_row(row) -> dict:
+    if not isinstance(row, dict):
+        raise ValueError("Malformed row")
+    name = (row.get("name") or "").strip()
+    email = (row.get("email") or "").strip()
+    if not name or not email:
+        raise ValueError("Name and email are required.")
+    return {
+        "name": name,
+        "email": email,
+        "age": _optional(row, "age", int),
+        "gender": (row.get("gender") or "").strip() or None,
+        "weight_goal": _optional(row, "weight_goal", float),
+        "current_weight": _optional(row, "current_weight", float),
+    }
+
+
+def _existing_emails(db: "OrmSession", emails) -> set[str]:
+    # every user type shares the unique index on users.email
+    return set(db.scalars(select(Member.__table__.c.email).where(Member.__table__.c.email.in_(emails))))
+
+
+def import_members(db: "OrmSession", rows, chunk_size: int = 1000) -> dict:
+    """Import (line_number, row) pairs, e.g. from batching.read_csv_rows().
+
+    Emails are deduplicated against earlier rows in memory and against the
+    database with one IN query per chunk; each chunk is then inserted with a
+    single executemany and committed on its own.
+    """
+    started = perf_counter()
+    processed = 0
+    imported = 0
+    rejected = []
+    duplicates = []
+    seen_emails = set()
+
+    for chunk in chunks(rows, chunk_size):
+        processed += len(chunk)
+        parsed = []
+        for line_number, row in chunk:
+            try:
+                parsed.append((line_number, _parse_row(row)))
+            except ValueError as exc:
+                rejected.append((line_number, str(exc)))
+
+        existing = _existing_emails(db, {member["email"] for _, member in parsed})
+        members = []
+        for line_number, member in parsed:
+            email = member["email"]
+            if email in seen_emails or email in existing:
+                duplicates.append(email)
+                rejected.append((line_number, "Email already registered"))
+                continue
+            seen_emails.add(email)
+            members.append((line_number, member))
+
+        if not members:
+            continue
+        try:
+            db.execute(insert(Member), [member for _, member in members])
+            db.commit()
+        except IntegrityError:
+            # another writer registered one of these emails after the IN check;
+            # look again and retry the rest of the chunk once
+            db.rollback()
+            existing = _existing_emails(db, {member["email"] for _, member in members})
+            retry = []
+            for line_number, member in members:
+                if member["email"] in existing:
+                    duplicates.append(member["email"])
+                    rejected.append((line_number, "Email already registered"))
+                else:
+                    retry.append((line_number, member))
+            members = retry
+            if members:
+                db.execute(insert(Member), [member for _, member in members])
+                db.commit()
+        imported += len(members)
+
+    # cached logins and name lookups predate the import
+    identity_cache.clear()
+    rejected.sort()
+    elapsed = perf_counter() - started
+    return {
+        "processed": processed,
+        "imported": imported,
+        "rejected": rejected,
+        "duplicate_emails": duplicates,
+        "elapsed_seconds": elapsed,
+        "rows_per_second": processed / elapsed if elapsed > 0 else 0.0,
+    }
@@ -0,0 +1,83 @@
+import re
+from sqlalchemy import DDL, event, literal_column, text
+from sqlalchemy.orm import Session as OrmSession
+from sqlalchemy.sql import column, table
+from user import User
+
+# FTS5 index over members' names; users stays the content table, so only the
+# inverted index is stored. Trainers are never indexed.
+MEMBER_SEARCH_DDL = (
+    DDL(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS member_search USING fts5("
+        "name, content='users', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2', prefix='1 2 3')"
+    ),
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS trg_member_search_insert "
+        "AFTER INSERT ON users WHEN NEW.user_type = 'member' "
+        "BEGIN "
+        "INSERT INTO member_search(rowid, name) VALUES (NEW.id, NEW.name); "
+        "END"
+    ),
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS trg_member_search_delete "
+        "AFTER DELETE ON users WHEN OLD.user_type = 'member' "
+        "BEGIN "
+        "INSERT INTO member_search(member_search, rowid, name) VALUES ('delete', OLD.id, OLD.name); "
+        "END"
+    ),
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS trg_member_search_update "
+        "AFTER UPDATE OF name ON users WHEN OLD.user_type = 'member' "
+        "BEGIN "
+        "INSERT INTO member_search(member_search, rowid, name) VALUES ('delete', OLD.id, OLD.name); "
+        "INSERT INTO member_search(rowid, name) VALUES (NEW.id, NEW.name); "
+        "END"
+    ),
+)
+
+for _ddl in MEMBER_SEARCH_DDL:
+    event.listen(User.__table__, "after_create", _ddl.execute_if(dialect="sqlite"))
+
+member_search = table("member_search", column("rowid"), column("rank"))
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def rebuild_member_search(conn) -> None:
+    conn.execute(text("INSERT INTO member_search(member_search) VALUES ('delete-all')"))
+    conn.execute(
+        text(
+            "INSERT INTO member_search(rowid, name) "
+            "SELECT id, name FROM users WHERE user_type = 'member' AND name IS NOT NULL"
+        )
+    )
+
+
+def to_match_expression(query: str) -> str | None:
+    # every typed word must match the start of a word in the name: "jo sm" -> "jo"* AND "sm"*
+    tokens = _TOKEN.findall(query)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def search_members(db: "OrmSession", query: str, limit: int = 10) -> list:
+    from member import Member
+
+    expression = to_match_expression(query)
+    if expression is None:
+        return []
+    search = (
+        db.query(Member)
+        .join(member_search, member_search.c.rowid == Member.id)
+        .filter(literal_column("member_search").op("MATCH")(expression))
+    )
+    # a single letter matches a large slice of the table and bm25 has to score
+    # every hit, so fall back to rowid order; either ordering also keeps
+    # member_search as the outer loop of the join
+    if len(query.strip()) > 1:
+        search = search.order_by(member_search.c.rank)
+    else:
+        search = search.order_by(member_search.c.rowid)
+    return search.limit(limit).all()
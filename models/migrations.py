@@ -0,0 +1,150 @@
+from sqlalchemy import inspect, text
+from user import Base
+from enrollment import CAPACITY_TRIGGER, ENROLLMENT_TRIGGERS
+from billing import Bill
+from fitness_class import CAPACITY_GUARD, FitnessClass
+from transaction_code import next_transaction_code
+from member_search import MEMBER_SEARCH_DDL, rebuild_member_search
+from timetable import SCHEDULE_VERSION_DDL
+from schedule_index import CLASS_SLOT_TRIGGERS, WINDOW_SLOT_TRIGGERS
+from class_occurrence import ClassException
+from waitlist import WaitlistEntry
+
+
+def _column_names(conn, table: str) -> set[str]:
+    return {column["name"] for column in inspect(conn).get_columns(table)}
+
+
+def _enrollment_counter(conn) -> None:
+    if "enrolled_count" not in _column_names(conn, "classes"):
+        conn.execute(text("ALTER TABLE classes ADD COLUMN enrolled_count INTEGER NOT NULL DEFAULT 0"))
+    conn.execute(
+        text(
+            "UPDATE classes SET enrolled_count = "
+            "(SELECT COUNT(*) FROM enrollments WHERE enrollments.class_id = classes.id)"
+        )
+    )
+    for trigger in ENROLLMENT_TRIGGERS:
+        conn.execute(trigger)
+
+
+def _bill_balances(conn) -> None:
+    columns = _column_names(conn, "bills")
+    for column in ("total_cents", "paid_cents"):
+        if column not in columns:
+            conn.execute(text(f"ALTER TABLE bills ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0"))
+    conn.execute(Bill._repair_balances_statement())
+
+
+def _unique_transaction_codes(conn) -> None:
+    # legacy codes were 4-digit random numbers; re-code every repeat after the
+    # first so the unique index can be built
+    duplicates = conn.execute(
+        text(
+            "SELECT id FROM payments p WHERE EXISTS ("
+            "SELECT 1 FROM payments q WHERE q.transaction_code = p.transaction_code AND q.id < p.id)"
+        )
+    ).scalars().all()
+    for payment_id in duplicates:
+        conn.execute(
+            text("UPDATE payments SET transaction_code = :code WHERE id = :id"),
+            {"code": next_transaction_code(), "id": payment_id},
+        )
+    conn.execute(
+        text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_payments_transaction_code "
+            "ON payments (transaction_code)"
+        )
+    )
+
+
+def _class_slot_indexes(conn) -> None:
+    for index in FitnessClass.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+
+def _user_name_index(conn) -> None:
+    # expression indexes are not reflected, so checkfirst cannot see them
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_users_name_lower ON users (lower(name))"))
+
+
+def _member_search(conn) -> None:
+    for ddl in MEMBER_SEARCH_DDL:
+        conn.execute(ddl)
+    rebuild_member_search(conn)
+
+
+def _schedule_version(conn) -> None:
+    for ddl in SCHEDULE_VERSION_DDL:
+        conn.execute(ddl)
+
+
+def _class_exceptions(conn) -> None:
+    ClassException.__table__.create(conn, checkfirst=True)
+
+
+def _waitlist(conn) -> None:
+    WaitlistEntry.__table__.create(conn, checkfirst=True)
+
+
+def _capacity_guard(conn) -> None:
+    conn.execute(CAPACITY_GUARD)
+
+
+def _capacity_trigger_duplicates(conn) -> None:
+    # CREATE TRIGGER IF NOT EXISTS would keep the old body
+    conn.exec_driver_sql("DROP TRIGGER IF EXISTS trg_enrollments_capacity")
+    conn.execute(CAPACITY_TRIGGER)
+
+
+def _slot_version(conn) -> None:
+    columns = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(schedule_version)")}
+    if "slot_version" not in columns:
+        conn.exec_driver_sql("ALTER TABLE schedule_version ADD COLUMN slot_version INTEGER NOT NULL DEFAULT 0")
+    for ddl in (*CLASS_SLOT_TRIGGERS, *WINDOW_SLOT_TRIGGERS):
+        conn.execute(ddl)
+
+
+# schema version N is reached by running MIGRATIONS[N - 1]; every step must also
+# be safe on a database that create_all() just built with the current models
+MIGRATIONS = [
+    _enrollment_counter,
+    _bill_balances,
+    _unique_transaction_codes,
+    _class_slot_indexes,
+    _user_name_index,
+    _member_search,
+    _schedule_version,
+    _class_exceptions,
+    _waitlist,
+    _capacity_guard,
+    _slot_version,
+    _capacity_trigger_duplicates,
+]
+
+
+def migrate(engine) -> int:
+    with engine.begin() as conn:
+        version = conn.exec_driver_sql("PRAGMA user_version").scalar()
+        for number, step in enumerate(MIGRATIONS[version:], start=version + 1):
+            step(conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {number}")
+    return len(MIGRATIONS)
+
+
+def init_db(engine) -> int:
+    # every model module has to be imported so create_all() sees its table
+    import admin, member, trainer, room, fitness_class, billing, enrollment, trainer_availability, timetable, class_occurrence, waitlist  # noqa: F401
+
+    Base.metadata.create_all(engine)
+    return migrate(engine)
+
+
+def ensure_schema(engine) -> bool:
+    # cheap version-stamp check so normal start-up skips reflection entirely
+    with engine.connect() as conn:
+        version = conn.exec_driver_sql("PRAGMA user_version").scalar()
+    if version >= len(MIGRATIONS):
+        return False
+    init_db(engine)
+    return True
@@ -0,0 +1,172 @@
+import json
+import math
+from time import perf_counter
+from sqlalchemy import bindparam, case, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session as OrmSession
+from batching import chunks, read_csv_rows
+from billing import Bill, Payment, to_cents
+
+
+def read_settlement_rows(path: str):
+    # yields (line_number, row) lazily so the file is never held in memory
+    if path.endswith(".csv"):
+        yield from read_csv_rows(path)
+        return
+    with open(path) as handle:
+        for line_number, line in enumerate(handle, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except json.JSONDecodeError:
+                yield line_number, None
+
+
+def _parse_row(row) -> tuple[int, int, int | None]:
+    if not isinstance(row, dict):
+        raise ValueError("Malformed row")
+    try:
+        bill_id = int(row["bill_id"])
+        amount = float(row["amount"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("bill_id and amount are required numbers")
+    if not math.isfinite(amount):
+        raise ValueError("amount must be a finite number")
+    cents = to_cents(amount)
+    if cents <= 0:
+        raise ValueError("Payment amount must be positive.")
+    code = row.get("transaction_code")
+    if code in (None, ""):
+        return bill_id, cents, None
+    try:
+        return bill_id, cents, int(code)
+    except (TypeError, ValueError):
+        raise ValueError("transaction_code must be a number")
+
+
+def _plan_chunk(db: "OrmSession", parsed: list, seen_codes: set) -> tuple[list, dict, list, list]:
+    # validates parsed rows against balances read now; writes nothing
+    bill_ids = {bill_id for _, bill_id, _, _ in parsed}
+    due_cents = {
+        bill_id: total - paid
+        for bill_id, total, paid in db.execute(
+            select(Bill.id, Bill.total_cents, Bill.paid_cents).where(Bill.id.in_(bill_ids))
+        )
+    }
+    codes = {code for _, _, _, code in parsed if code is not None}
+    existing_codes = set(
+        db.scalars(select(Payment.transaction_code).where(Payment.transaction_code.in_(codes)))
+    )
+
+    payments = []
+    deltas = {}
+    rejected = []
+    duplicates = []
+    chunk_codes = set()
+    for line_number, bill_id, cents, code in parsed:
+        if code is not None and (code in seen_codes or code in chunk_codes or code in existing_codes):
+            duplicates.append(code)
+            rejected.append((line_number, f"Duplicate transaction_code {code}"))
+            continue
+        if bill_id not in due_cents:
+            rejected.append((line_number, "Bill not found"))
+            continue
+        if due_cents[bill_id] <= 0:
+            rejected.append((line_number, "Bill is already fully paid."))
+            continue
+        if cents > due_cents[bill_id]:
+            rejected.append((line_number, "Payment amount exceeds amount due."))
+            continue
+
+        due_cents[bill_id] -= cents
+        deltas[bill_id] = deltas.get(bill_id, 0) + cents
+        if code is None:
+            code = Payment.new_transaction_code()
+        chunk_codes.add(code)
+        payments.append(
+            {
+                "bill_id": bill_id,
+                "amount": cents / 100,
+                "status": "completed",
+                "transaction_code": code,
+            }
+        )
+    return payments, deltas, rejected, duplicates
+
+
+def import_payments(db: "OrmSession", rows, chunk_size: int = 1000) -> dict:
+    """Import (line_number, row) pairs, e.g. from read_settlement_rows().
+
+    Each chunk is validated in memory against balances preloaded with one
+    IN query, then inserted and applied to the bills in one transaction.
+    """
+    started = perf_counter()
+    processed = 0
+    imported = 0
+    rejected = []
+    duplicates = []
+    seen_codes = set()
+
+    # same overpayment guard as Bill.apply_balance_delta
+    new_paid = Bill.__table__.c.paid_cents + bindparam("delta")
+    apply_payment = (
+        update(Bill.__table__)
+        .where(Bill.__table__.c.id == bindparam("bill"), new_paid <= Bill.__table__.c.total_cents)
+        .values(
+            paid_cents=new_paid,
+            status=case(
+                (new_paid >= Bill.__table__.c.total_cents, "paid"),
+                else_="partial",
+            ),
+        )
+    )
+
+    for chunk in chunks(rows, chunk_size):
+        processed += len(chunk)
+        parsed = []
+        for line_number, row in chunk:
+            try:
+                parsed.append((line_number, *_parse_row(row)))
+            except ValueError as exc:
+                rejected.append((line_number, str(exc)))
+
+        for _ in range(2):
+            payments, deltas, chunk_rejected, chunk_duplicates = _plan_chunk(db, parsed, seen_codes)
+            if not payments:
+                break
+            try:
+                db.execute(insert(Payment), payments)
+            except IntegrityError:
+                # another writer took one of these transaction codes; the retry
+                # re-checks file codes and draws fresh generated ones
+                db.rollback()
+                continue
+            result = db.execute(
+                apply_payment,
+                [{"bill": bill_id, "delta": delta} for bill_id, delta in deltas.items()],
+            )
+            if result.rowcount == len(deltas):
+                db.commit()
+                imported += len(payments)
+                seen_codes.update(payment["transaction_code"] for payment in payments)
+                break
+            # another writer paid one of these bills after the balances were
+            # read; re-read them and retry the chunk once
+            db.rollback()
+        else:
+            chunk_rejected = [(line_number, "Bills or codes changed during import") for line_number, *_ in parsed]
+            chunk_duplicates = []
+        rejected.extend(chunk_rejected)
+        duplicates.extend(chunk_duplicates)
+
+    elapsed = perf_counter() - started
+    return {
+        "processed": processed,
+        "imported": imported,
+        "rejected": rejected,
+        "duplicate_transaction_codes": duplicates,
+        "elapsed_seconds": elapsed,
+        "rows_per_second": processed / elapsed if elapsed > 0 else 0.0,
+    }
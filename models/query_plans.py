@@ -0,0 +1,142 @@
+import re
+from datetime import time
+from sqlalchemy.orm import Session as OrmSession
+
+# "SCAN users" / "SCAN TABLE users" reads the whole table, and so does
+# "SCAN x USING INDEX": the index only supplies the order. SEARCH lines, the
+# FTS virtual-table scan and constant rows are fine
+FULL_SCAN = re.compile(r"^SCAN (TABLE )?\w+( USING (COVERING )?INDEX \w+)?$")
+
+# paths that read every class on purpose: both build the whole week (the
+# timetable snapshot, the occurrence expansion) in timetable order
+WHOLE_TABLE_READS = {"weekly timetable", "upcoming class sessions"}
+
+
+def hot_paths() -> list:
+    """(name, callable(db, seed)) for every request-path query that must use an index."""
+    from billing import Bill, Payment
+    from class_occurrence import upcoming_occurrences
+    from fitness_class import FitnessClass
+    from member import Member
+    from timetable import WeeklyTimetable
+    from trainer import Trainer
+    from trainer_availability import TrainerAvailability
+    from waitlist import WaitlistEntry
+
+    return [
+        (
+            "class availability and conflict checks",
+            lambda db, seed: FitnessClass._check_slot(
+                db, seed["trainer"].id, seed["room"].id, 1, time(10), time(11), exclude_id=seed["class"].id
+            ),
+        ),
+        (
+            "bulk scheduling",
+            lambda db, seed: FitnessClass.schedule_bulk(
+                db,
+                [
+                    {
+                        "name": "Plan Bulk",
+                        "trainer_id": seed["trainer"].id,
+                        "room_id": seed["room"].id,
+                        "day_of_week": 1,
+                        "start_time": time(9),
+                        "end_time": time(10),
+                    }
+                ],
+            ),
+        ),
+        (
+            "availability window overlap",
+            lambda db, seed: TrainerAvailability.create_window(db, seed["trainer"].id, 2, time(8), time(9)),
+        ),
+        ("member login by email", lambda db, seed: Member.get_by_email(db, "member@example.com")),
+        ("trainer login by email", lambda db, seed: Trainer.get_by_email(db, "trainer@example.com")),
+        ("trainer member lookup", lambda db, seed: seed["trainer"].lookup_member(db, "plan member")),
+        ("trainer member search", lambda db, seed: seed["trainer"].search_members(db, "pla mem")),
+        ("member dashboard", lambda db, seed: seed["member"].get_dashboard(db)),
+        ("class registration", lambda db, seed: _expect_error(seed["member"].register_for_class, db, seed["class"].id)),
+        (
+            "waitlist positions",
+            lambda db, seed: (
+                WaitlistEntry.position(db, seed["member"].id, seed["class"].id),
+                WaitlistEntry.promote(db, seed["class"].id),
+                seed["member"].get_waitlist_positions(db),
+            ),
+        ),
+        ("payment by transaction code", lambda db, seed: Payment.get_by_transaction_code(db, 1)),
+        ("member page", lambda db, seed: Member.iter_page(db, after_id=0, limit=20)),
+        (
+            "class timetable page",
+            lambda db, seed: FitnessClass.iter_page(db, after_key=(1, time(0), 0), limit=20),
+        ),
+        ("weekly timetable", lambda db, seed: WeeklyTimetable.current(db)),
+        ("upcoming class sessions", lambda db, seed: list(upcoming_occurrences(db, days=30))),
+        (
+            "classes with open seats",
+            lambda db, seed: FitnessClass.with_seat_counts(db, seats_only=True, after_key=(1, time(0), 0)).limit(20).all(),
+        ),
+        (
+            "bill page with details",
+            lambda db, seed: Bill.iter_page(db, after_id=seed["bill"].id + 1, limit=20, member_id=seed["member"].id),
+        ),
+    ]
+
+
+def _expect_error(func, *args):
+    try:
+        func(*args)
+    except ValueError:
+        pass
+
+
+def check_query_plans(engine=None) -> list[dict]:
+    """Run each hot path on a seeded database and EXPLAIN every statement it issued."""
+    from check_harness import captured_statements, private_engine, seed
+    from dashboard_cache import dashboard_cache
+    from identity_cache import identity_cache
+    from migrations import init_db
+    from schedule_index import ScheduleIndex
+
+    if engine is None:
+        engine = private_engine()
+    else:
+        init_db(engine)
+
+    captured = []
+    with OrmSession(bind=engine) as db:
+        fixtures = seed(db)
+        # force the conflict checks down to their SQL fallback and the cached
+        # reads down to their queries
+        index_enabled = ScheduleIndex.enabled
+        ScheduleIndex.enabled = False
+        identity_cache.clear()
+        dashboard_cache.clear()
+        try:
+            for path, run in hot_paths():
+                with captured_statements(engine) as statements:
+                    run(db, fixtures)
+                captured += [
+                    (path, statement, parameters)
+                    for statement, parameters, executemany in statements
+                    if not executemany
+                    and statement.lstrip().upper().startswith(("SELECT", "INSERT", "UPDATE", "DELETE"))
+                ]
+        finally:
+            ScheduleIndex.enabled = index_enabled
+
+    results = []
+    with engine.connect() as conn:
+        for path, statement, parameters in captured:
+            plan = [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+            results.append(
+                {
+                    "path": path,
+                    "statement": " ".join(statement.split()),
+                    "plan": plan,
+                    "full_scans": [
+                        line for line in plan if FULL_SCAN.match(line) and path not in WHOLE_TABLE_READS
+                    ],
+                }
+            )
+    return results
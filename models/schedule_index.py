@@ -0,0 +1,290 @@
+from bisect import bisect_left, bisect_right
+from threading import RLock
+from weakref import WeakKeyDictionary
+from sqlalchemy import DDL, select, text
+from sqlalchemy.orm import Session as OrmSession
+
+# slot_version lives in the schedule_version row (see timetable.py). It moves on
+# every write that can change a conflict answer, whichever process makes it;
+# enrolled_count updates leave it alone
+CLASS_SLOT_TRIGGERS = (
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS trg_slot_version_class_insert AFTER INSERT ON classes "
+        "BEGIN UPDATE schedule_version SET slot_version = slot_version + 1; END"
+    ),
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS trg_slot_version_class_update "
+        "AFTER UPDATE OF trainer_id, room_id, day_of_week, start_time, end_time ON classes "
+        "BEGIN UPDATE schedule_version SET slot_version = slot_version + 1; END"
+    ),
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS trg_slot_version_class_delete AFTER DELETE ON classes "
+        "BEGIN UPDATE schedule_version SET slot_version = slot_version + 1; END"
+    ),
+)
+
+WINDOW_SLOT_TRIGGERS = (
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS trg_slot_version_window_insert AFTER INSERT ON trainer_availability "
+        "BEGIN UPDATE schedule_version SET slot_version = slot_version + 1; END"
+    ),
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS trg_slot_version_window_update AFTER UPDATE ON trainer_availability "
+        "BEGIN UPDATE schedule_version SET slot_version = slot_version + 1; END"
+    ),
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS trg_slot_version_window_delete AFTER DELETE ON trainer_availability "
+        "BEGIN UPDATE schedule_version SET slot_version = slot_version + 1; END"
+    ),
+)
+
+
+def slot_version(db: "OrmSession") -> int:
+    return db.execute(text("SELECT slot_version FROM schedule_version WHERE id = 1")).scalar_one()
+
+
+class _IntervalSet:
+    # sorted by start; scheduling keeps intervals per key disjoint, which is
+    # what makes the single-neighbour probes below O(log n)
+    __slots__ = ("starts", "items", "overlapping")
+
+    def __init__(self):
+        self.starts = []
+        self.items = []
+        self.overlapping = False
+
+    def add(self, start, end, ident) -> None:
+        i = bisect_right(self.starts, start)
+        if i > 0 and self.items[i - 1][1] > start:
+            self.overlapping = True
+        if i < len(self.items) and self.items[i][0] < end:
+            self.overlapping = True
+        self.starts.insert(i, start)
+        self.items.insert(i, (start, end, ident))
+
+    def remove(self, start, ident) -> None:
+        i = bisect_left(self.starts, start)
+        while i < len(self.items) and self.items[i][0] == start:
+            if self.items[i][2] == ident:
+                del self.starts[i]
+                del self.items[i]
+                break
+            i += 1
+        if self.overlapping:
+            self.overlapping = any(
+                a[1] > b[0] for a, b in zip(self.items, self.items[1:])
+            )
+
+    def overlaps(self, start, end, exclude=None) -> bool | None:
+        if self.overlapping:
+            return None
+        j = bisect_left(self.starts, end) - 1
+        while j >= 0:
+            _, item_end, ident = self.items[j]
+            if ident != exclude:
+                return item_end > start
+            j -= 1
+        return False
+
+    def contains(self, start, end) -> bool | None:
+        if self.overlapping:
+            return None
+        i = bisect_right(self.starts, start) - 1
+        return i >= 0 and self.items[i][1] >= end
+
+
+class ScheduleIndex:
+    """Per-engine, per-day interval index over classes and trainer availability.
+
+    Stamped with the slot_version it was loaded at; current() reloads it when
+    the stored counter has moved, so a current index answers for every process.
+    Lookups return None when the stored data already violates the no-overlap
+    invariant; callers then fall back to the database query.
+    """
+
+    enabled = True
+    _registry: "WeakKeyDictionary" = WeakKeyDictionary()
+    _registry_lock = RLock()
+
+    def __init__(self):
+        self._lock = RLock()
+        self.version = None
+        self._trainer_classes: dict[tuple, _IntervalSet] = {}
+        self._room_classes: dict[tuple, _IntervalSet] = {}
+        self._windows: dict[tuple, _IntervalSet] = {}
+        self._class_rows: dict[int, tuple] = {}
+        self._window_rows: dict[int, tuple] = {}
+
+    @classmethod
+    def current(cls, db: "OrmSession") -> "ScheduleIndex | None":
+        # one primary-key read decides whether the index can be trusted
+        if not cls.enabled:
+            return None
+        bind = db.get_bind()
+        with cls._registry_lock:
+            index = cls._registry.get(bind)
+            if index is None:
+                index = cls()
+                cls._registry[bind] = index
+        version = slot_version(db)
+        with index._lock:
+            if index.version != version:
+                index._load(db)
+        return index
+
+    def _load(self, db: "OrmSession") -> None:
+        from fitness_class import FitnessClass
+        from trainer_availability import TrainerAvailability
+
+        # committed state only, through a separate session; the stamp is read
+        # first, so a write landing mid-load only costs one more reload
+        with OrmSession(bind=db.get_bind()) as reader:
+            version = slot_version(reader)
+            classes = reader.execute(
+                select(
+                    FitnessClass.id,
+                    FitnessClass.trainer_id,
+                    FitnessClass.room_id,
+                    FitnessClass.day_of_week,
+                    FitnessClass.start_time,
+                    FitnessClass.end_time,
+                )
+            ).all()
+            windows = reader.execute(
+                select(
+                    TrainerAvailability.id,
+                    TrainerAvailability.trainer_id,
+                    TrainerAvailability.day_of_week,
+                    TrainerAvailability.start_time,
+                    TrainerAvailability.end_time,
+                )
+            ).all()
+
+        self._trainer_classes.clear()
+        self._room_classes.clear()
+        self._windows.clear()
+        self._class_rows.clear()
+        self._window_rows.clear()
+        for row in classes:
+            self.put_class(*row)
+        for row in windows:
+            self.put_window(*row)
+        self.version = version
+
+    @classmethod
+    def for_batch(cls, db: "OrmSession", days, trainer_ids, room_ids) -> "ScheduleIndex":
+        """An unregistered index over what a batch of new classes can collide with.
+
+        Only the given days are loaded: the classes of the given trainers and
+        rooms and the windows of the given trainers, one IN query each.
+        """
+        from fitness_class import FitnessClass
+        from trainer_availability import TrainerAvailability
+
+        index = cls()
+        days = list(days)
+        class_columns = (
+            FitnessClass.id,
+            FitnessClass.trainer_id,
+            FitnessClass.room_id,
+            FitnessClass.day_of_week,
+            FitnessClass.start_time,
+            FitnessClass.end_time,
+        )
+        # put_class replaces by id, so a class found by both queries is held once
+        for owner, ids in ((FitnessClass.trainer_id, trainer_ids), (FitnessClass.room_id, room_ids)):
+            if ids:
+                query = select(*class_columns).where(owner.in_(list(ids)), FitnessClass.day_of_week.in_(days))
+                for row in db.execute(query):
+                    index.put_class(*row)
+        if trainer_ids:
+            windows = db.execute(
+                select(
+                    TrainerAvailability.id,
+                    TrainerAvailability.trainer_id,
+                    TrainerAvailability.day_of_week,
+                    TrainerAvailability.start_time,
+                    TrainerAvailability.end_time,
+                ).where(
+                    TrainerAvailability.trainer_id.in_(list(trainer_ids)),
+                    TrainerAvailability.day_of_week.in_(days),
+                )
+            )
+            for row in windows:
+                index.put_window(*row)
+        return index
+
+    @classmethod
+    def class_added(cls, db: "OrmSession", checked_version: int, version: int, class_id, *slot) -> None:
+        """Fold in a class this process inserted, given the stamp read after the insert.
+
+        The insert bumps slot_version exactly once, so any other gap means
+        another writer got in and the next current() reloads instead.
+        """
+        with cls._registry_lock:
+            index = cls._registry.get(db.get_bind())
+        if index is None:
+            return
+        with index._lock:
+            if index.version == checked_version and version == checked_version + 1:
+                index.put_class(class_id, *slot)
+                index.version = version
+
+    def put_class(self, class_id, trainer_id, room_id, day_of_week, start_time, end_time) -> None:
+        with self._lock:
+            self.drop_class(class_id)
+            self._class_rows[class_id] = (trainer_id, room_id, day_of_week, start_time)
+            self._trainer_classes.setdefault((day_of_week, trainer_id), _IntervalSet()).add(
+                start_time, end_time, class_id
+            )
+            if room_id is not None:
+                self._room_classes.setdefault((day_of_week, room_id), _IntervalSet()).add(
+                    start_time, end_time, class_id
+                )
+
+    def drop_class(self, class_id) -> None:
+        with self._lock:
+            row = self._class_rows.pop(class_id, None)
+            if row is None:
+                return
+            trainer_id, room_id, day_of_week, start_time = row
+            self._trainer_classes[(day_of_week, trainer_id)].remove(start_time, class_id)
+            if room_id is not None:
+                self._room_classes[(day_of_week, room_id)].remove(start_time, class_id)
+
+    def put_window(self, window_id, trainer_id, day_of_week, start_time, end_time) -> None:
+        with self._lock:
+            self.drop_window(window_id)
+            self._window_rows[window_id] = (trainer_id, day_of_week, start_time)
+            self._windows.setdefault((day_of_week, trainer_id), _IntervalSet()).add(
+                start_time, end_time, window_id
+            )
+
+    def drop_window(self, window_id) -> None:
+        with self._lock:
+            row = self._window_rows.pop(window_id, None)
+            if row is None:
+                return
+            trainer_id, day_of_week, start_time = row
+            self._windows[(day_of_week, trainer_id)].remove(start_time, window_id)
+
+    def trainer_available(self, trainer_id, day_of_week, start_time, end_time) -> bool | None:
+        with self._lock:
+            windows = self._windows.get((day_of_week, trainer_id))
+            if windows is None:
+                return False
+            return windows.contains(start_time, end_time)
+
+    def trainer_busy(self, trainer_id, day_of_week, start_time, end_time, exclude_id=None) -> bool | None:
+        with self._lock:
+            classes = self._trainer_classes.get((day_of_week, trainer_id))
+            if classes is None:
+                return False
+            return classes.overlaps(start_time, end_time, exclude_id)
+
+    def room_busy(self, room_id, day_of_week, start_time, end_time, exclude_id=None) -> bool | None:
+        with self._lock:
+            classes = self._room_classes.get((day_of_week, room_id))
+            if classes is None:
+                return False
+            return classes.overlaps(start_time, end_time, exclude_id)
@@ -0,0 +1,392 @@
+from bisect import insort
+from datetime import datetime, time
+from time import perf_counter
+from sqlalchemy import select
+from sqlalchemy.orm import Session as OrmSession
+from user import User
+from room import Room
+from fitness_class import FitnessClass
+from trainer_availability import TrainerAvailability
+
+DAYS = range(1, 8)
+
+
+def to_minutes(value: time) -> int:
+    return value.hour * 60 + value.minute
+
+
+def to_time(minutes: int) -> time:
+    return time(minutes // 60, minutes % 60)
+
+
+def merge_intervals(intervals) -> list[tuple[int, int]]:
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def free_gaps(busy, start: int, end: int) -> list[tuple[int, int]]:
+    # busy must be sorted by start; returns the uncovered parts of [start, end)
+    gaps = []
+    cursor = start
+    for busy_start, busy_end in busy:
+        if busy_end <= cursor:
+            continue
+        if busy_start >= end:
+            break
+        if busy_start > cursor:
+            gaps.append((cursor, busy_start))
+        cursor = max(cursor, busy_end)
+        if cursor >= end:
+            return gaps
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def first_common_start(gaps_a, gaps_b, duration: int) -> int | None:
+    # two-pointer sweep over two sorted gap lists
+    i = j = 0
+    while i < len(gaps_a) and j < len(gaps_b):
+        start = max(gaps_a[i][0], gaps_b[j][0])
+        end = min(gaps_a[i][1], gaps_b[j][1])
+        if end - start >= duration:
+            return start
+        if gaps_a[i][1] < gaps_b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return None
+
+
+def common_gaps(gaps_a, gaps_b, min_length: int = 1) -> list[tuple[int, int]]:
+    # every stretch free in both sorted gap lists and at least min_length long
+    common = []
+    i = j = 0
+    while i < len(gaps_a) and j < len(gaps_b):
+        start = max(gaps_a[i][0], gaps_b[j][0])
+        end = min(gaps_a[i][1], gaps_b[j][1])
+        if end - start >= min_length:
+            common.append((start, end))
+        if gaps_a[i][1] < gaps_b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return common
+
+
+def _parse_time(value) -> time | None:
+    if value in (None, ""):
+        return None
+    if isinstance(value, time):
+        return value
+    try:
+        return datetime.strptime(str(value).strip(), "%H:%M").time()
+    except ValueError:
+        raise ValueError(f"Invalid time {value!r}; use HH:MM")
+
+
+def _parse_int(row: dict, field: str) -> int | None:
+    value = row.get(field)
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be a number")
+
+
+def _parse_days(value) -> list[int]:
+    if value in (None, ""):
+        return list(DAYS)
+    if isinstance(value, int):
+        value = [value]
+    if isinstance(value, str):
+        value = value.replace(";", " ").replace(",", " ").split()
+    try:
+        days = [int(day) for day in value]
+    except (TypeError, ValueError):
+        raise ValueError("days must be numbers between 1 and 7")
+    if not days or any(not (1 <= day <= 7) for day in days):
+        raise ValueError("days must be numbers between 1 and 7")
+    return list(dict.fromkeys(days))
+
+
+def parse_class_request(row: dict) -> dict:
+    """Normalise one desired class; string values (e.g. from a CSV) are accepted."""
+    name = (row.get("name") or "").strip()
+    if not name:
+        raise ValueError("name is required")
+    duration = _parse_int(row, "duration_minutes")
+    if duration is None or duration <= 0:
+        raise ValueError("duration_minutes must be a positive number")
+    earliest = _parse_time(row.get("earliest"))
+    latest = _parse_time(row.get("latest"))
+    request = {
+        "name": name,
+        "duration": duration,
+        "capacity": _parse_int(row, "capacity"),
+        "trainer_id": _parse_int(row, "trainer_id"),
+        "room_id": _parse_int(row, "room_id"),
+        "days": _parse_days(row.get("days")),
+        "earliest": 0 if earliest is None else to_minutes(earliest),
+        "latest": 24 * 60 - 1 if latest is None else to_minutes(latest),
+    }
+    if request["latest"] - request["earliest"] < duration:
+        raise ValueError("earliest/latest leave less time than duration_minutes")
+    return request
+
+
+class ScheduleSolver:
+    """Greedy, most-constrained-first placement of desired classes.
+
+    Trainer windows, room bookings and trainer bookings are kept as sorted
+    minute intervals per (id, day). A class goes into the earliest start where
+    a free stretch of one trainer window overlaps a free stretch of a room for
+    the whole duration, found with a two-pointer sweep. Rooms are tried
+    smallest-sufficient first and trainers least-loaded first, so big rooms and
+    busy trainers are kept for the requests that need them.
+    """
+
+    def __init__(self, windows: dict, trainer_busy: dict, room_busy: dict, rooms: dict, trainers: set):
+        self.windows = windows
+        self.trainer_busy = trainer_busy
+        self.room_busy = room_busy
+        self.rooms = rooms
+        self.trainers = trainers
+        self.trainer_load = {trainer_id: 0 for trainer_id in trainers}
+
+    @classmethod
+    def load(cls, db: "OrmSession", day_of_week: int | None = None) -> "ScheduleSolver":
+        # day_of_week limits the windows and bookings loaded to that one day
+        trainers = set(db.scalars(select(User.id).where(User.user_type == "trainer")))
+        rooms = dict(db.execute(select(Room.id, Room.capacity)).all())
+
+        window_query = select(
+            TrainerAvailability.trainer_id,
+            TrainerAvailability.day_of_week,
+            TrainerAvailability.start_time,
+            TrainerAvailability.end_time,
+        )
+        class_query = select(
+            FitnessClass.trainer_id,
+            FitnessClass.room_id,
+            FitnessClass.day_of_week,
+            FitnessClass.start_time,
+            FitnessClass.end_time,
+        )
+        if day_of_week is not None:
+            window_query = window_query.where(TrainerAvailability.day_of_week == day_of_week)
+            class_query = class_query.where(FitnessClass.day_of_week == day_of_week)
+
+        windows = {}
+        for trainer_id, day, start, end in db.execute(window_query):
+            windows.setdefault((trainer_id, day), []).append((to_minutes(start), to_minutes(end)))
+
+        trainer_busy = {}
+        room_busy = {}
+        for trainer_id, room_id, day, start, end in db.execute(class_query):
+            slot = (to_minutes(start), to_minutes(end))
+            trainer_busy.setdefault((trainer_id, day), []).append(slot)
+            if room_id is not None:
+                room_busy.setdefault((room_id, day), []).append(slot)
+
+        for intervals in (*windows.values(), *trainer_busy.values(), *room_busy.values()):
+            intervals.sort()
+        solver = cls(windows, trainer_busy, room_busy, rooms, trainers)
+        for (trainer_id, _), busy in trainer_busy.items():
+            if trainer_id in solver.trainer_load:
+                solver.trainer_load[trainer_id] += sum(end - start for start, end in busy)
+        return solver
+
+    def _candidate_rooms(self, request: dict) -> list[int]:
+        if request["room_id"] is not None:
+            if request["room_id"] not in self.rooms:
+                raise ValueError("Room not found.")
+            capacity = self.rooms[request["room_id"]]
+            if request["capacity"] is not None and capacity is not None and request["capacity"] > capacity:
+                raise ValueError(f"Capacity cannot exceed room capacity ({capacity}).")
+            return [request["room_id"]]
+        need = request["capacity"] or 0
+        fitting = [
+            room_id for room_id, capacity in self.rooms.items()
+            if capacity is None or capacity >= need
+        ]
+        if not fitting:
+            raise ValueError(f"No room with capacity >= {need}.")
+        # a room with no declared capacity is the last resort
+        return sorted(fitting, key=lambda room_id: (self.rooms[room_id] is None, self.rooms[room_id] or 0, room_id))
+
+    def _candidate_trainers(self, request: dict) -> list[int]:
+        if request["trainer_id"] is not None:
+            if request["trainer_id"] not in self.trainers:
+                raise ValueError("Trainer not found.")
+            candidates = [request["trainer_id"]]
+        else:
+            candidates = list(self.trainers)
+        candidates = [
+            trainer_id for trainer_id in candidates
+            if any((trainer_id, day) in self.windows for day in request["days"])
+        ]
+        if not candidates:
+            raise ValueError("No trainer has availability on the requested days.")
+        return candidates
+
+    def _constrainedness(self, request: dict) -> tuple:
+        return (
+            len(request["trainers"]),
+            len(request["rooms"]),
+            len(request["days"]),
+            -request["duration"],
+            -(request["capacity"] or 0),
+        )
+
+    def _find_slot(self, request: dict) -> tuple | None:
+        duration = request["duration"]
+        trainers = sorted(request["trainers"], key=lambda trainer_id: (self.trainer_load[trainer_id], trainer_id))
+        for day in request["days"]:
+            for trainer_id in trainers:
+                for window_start, window_end in self.windows.get((trainer_id, day), ()):
+                    start = max(window_start, request["earliest"])
+                    end = min(window_end, request["latest"])
+                    if end - start < duration:
+                        continue
+                    trainer_gaps = [
+                        gap for gap in free_gaps(self.trainer_busy.get((trainer_id, day), ()), start, end)
+                        if gap[1] - gap[0] >= duration
+                    ]
+                    if not trainer_gaps:
+                        continue
+                    for room_id in request["rooms"]:
+                        room_gaps = free_gaps(
+                            self.room_busy.get((room_id, day), ()), trainer_gaps[0][0], trainer_gaps[-1][1]
+                        )
+                        slot_start = first_common_start(trainer_gaps, room_gaps, duration)
+                        if slot_start is not None:
+                            return trainer_id, room_id, day, slot_start
+        return None
+
+    def free_slots(self, day_of_week: int, duration: int, min_room_capacity: int | None = None) -> list[dict]:
+        """Every (trainer, room) stretch on one day long enough for duration minutes, best fit first.
+
+        Fit prefers the room with the least spare capacity, then the stretch
+        with the least spare time, then the earliest start.
+        """
+        need = min_room_capacity or 0
+        room_gaps = {
+            room_id: free_gaps(merge_intervals(self.room_busy.get((room_id, day_of_week), ())), 0, 24 * 60)
+            for room_id, capacity in self.rooms.items()
+            if capacity is None or capacity >= need
+        }
+        slots = []
+        for trainer_id in self.trainers:
+            busy = merge_intervals(self.trainer_busy.get((trainer_id, day_of_week), ()))
+            # windows are not merged with each other: a class has to sit inside one window
+            trainer_gaps = [
+                gap
+                for window_start, window_end in self.windows.get((trainer_id, day_of_week), ())
+                for gap in free_gaps(busy, window_start, window_end)
+                if gap[1] - gap[0] >= duration
+            ]
+            if not trainer_gaps:
+                continue
+            for room_id, gaps in room_gaps.items():
+                capacity = self.rooms[room_id]
+                for start, end in common_gaps(trainer_gaps, gaps, duration):
+                    slots.append(
+                        {
+                            "trainer_id": trainer_id,
+                            "room_id": room_id,
+                            "room_capacity": capacity,
+                            "day_of_week": day_of_week,
+                            "start_time": to_time(start),
+                            "end_time": to_time(end),
+                            "spare_minutes": end - start - duration,
+                            "spare_seats": None if capacity is None else capacity - need,
+                        }
+                    )
+        slots.sort(
+            key=lambda slot: (
+                slot["spare_seats"] is None,
+                slot["spare_seats"] or 0,
+                slot["spare_minutes"],
+                slot["start_time"],
+                slot["trainer_id"],
+                slot["room_id"],
+            )
+        )
+        return slots
+
+    def _book(self, trainer_id: int, room_id: int, day: int, start: int, end: int) -> None:
+        insort(self.trainer_busy.setdefault((trainer_id, day), []), (start, end))
+        insort(self.room_busy.setdefault((room_id, day), []), (start, end))
+        self.trainer_load[trainer_id] += end - start
+
+    def solve(self, rows) -> dict:
+        """Place (position, row) pairs; returns placed class rows and (position, reason) for the rest."""
+        started = perf_counter()
+        requests = []
+        unplaced = []
+        for position, row in rows:
+            try:
+                request = parse_class_request(row)
+                request["trainers"] = self._candidate_trainers(request)
+                request["rooms"] = self._candidate_rooms(request)
+            except ValueError as exc:
+                unplaced.append((position, str(exc)))
+                continue
+            request["position"] = position
+            requests.append(request)
+
+        placed = []
+        for request in sorted(requests, key=self._constrainedness):
+            slot = self._find_slot(request)
+            if slot is None:
+                unplaced.append((request["position"], "No free slot for a trainer and room within the constraints."))
+                continue
+            trainer_id, room_id, day, start = slot
+            end = start + request["duration"]
+            self._book(trainer_id, room_id, day, start, end)
+            capacity = request["capacity"] if request["capacity"] is not None else self.rooms[room_id]
+            placed.append(
+                {
+                    "position": request["position"],
+                    "name": request["name"],
+                    "trainer_id": trainer_id,
+                    "room_id": room_id,
+                    "day_of_week": day,
+                    "start_time": to_time(start),
+                    "end_time": to_time(end),
+                    "capacity": capacity,
+                }
+            )
+
+        placed.sort(key=lambda row: row["position"])
+        unplaced.sort()
+        return {
+            "placed": placed,
+            "unplaced": unplaced,
+            "elapsed_seconds": perf_counter() - started,
+        }
+
+
+def solve_schedule(db: "OrmSession", rows) -> dict:
+    return ScheduleSolver.load(db).solve(rows)
+
+
+def find_free_slots(
+    db: "OrmSession",
+    day_of_week: int,
+    duration: int,
+    min_room_capacity: int | None = None,
+) -> list[dict]:
+    if not (1 <= day_of_week <= 7):
+        raise ValueError("day_of_week must be between 1 and 7")
+    if duration <= 0:
+        raise ValueError("duration must be a positive number of minutes")
+    return ScheduleSolver.load(db, day_of_week).free_slots(day_of_week, duration, min_room_capacity)
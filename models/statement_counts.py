@@ -0,0 +1,49 @@
+from sqlalchemy.orm import Session as OrmSession
+
+
+def listing_paths() -> list:
+    """(name, callable(db, seed)) for listings that must not issue a statement per row."""
+    from admin import Admin
+    from billing import Bill
+
+    def bill_page(db, fixtures):
+        # touch every collection the admin bill view prints
+        for bill in Bill.iter_page(db, limit=1000):
+            len(bill.line_items)
+            len(bill.payments)
+
+    def trainer_availabilities(db, fixtures):
+        for window in Admin.get_all_trainer_availabilities(db):
+            window.trainer.name
+
+    return [
+        ("bill page with details", bill_page),
+        ("trainer availability listing", trainer_availabilities),
+    ]
+
+
+def _count(rows: int) -> dict:
+    from check_harness import captured_statements, private_engine, seed
+
+    engine = private_engine()
+    with OrmSession(bind=engine) as db:
+        fixtures = seed(db, rows)
+
+    counts = {}
+    for path, run in listing_paths():
+        # a fresh session per path, so nothing is served from the identity map
+        with OrmSession(bind=engine) as db, captured_statements(engine) as statements:
+            run(db, fixtures)
+        counts[path] = len(statements)
+    engine.dispose()
+    return counts
+
+
+def check_statement_counts(rows: int = 50) -> list[dict]:
+    """Run each listing over 1 row and over `rows` rows; the statement count must not grow."""
+    single = _count(1)
+    many = _count(rows)
+    return [
+        {"path": path, "single": single[path], "many": many[path], "bounded": single[path] == many[path]}
+        for path in single
+    ]
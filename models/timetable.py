@@ -0,0 +1,126 @@
+from bisect import bisect_right
+from threading import Lock
+from weakref import WeakKeyDictionary
+from sqlalchemy import DDL, event, select, text
+from sqlalchemy.orm import Session as OrmSession
+from user import User
+from room import Room
+from fitness_class import FitnessClass
+
+DAY_NAMES = {
+    1: "Monday",
+    2: "Tuesday",
+    3: "Wednesday",
+    4: "Thursday",
+    5: "Friday",
+    6: "Saturday",
+    7: "Sunday",
+}
+
+# one-row counter bumped by every write to classes, including the enrolled_count
+# updates made by the enrollment triggers, so any process can tell whether a
+# timetable it built is still current; slot_version is the schedule index's
+# counter (see schedule_index.py)
+SCHEDULE_VERSION_DDL = (
+    DDL(
+        "CREATE TABLE IF NOT EXISTS schedule_version ("
+        "id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL, "
+        "slot_version INTEGER NOT NULL DEFAULT 0)"
+    ),
+    DDL("INSERT OR IGNORE INTO schedule_version (id, version) VALUES (1, 0)"),
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS trg_schedule_version_insert AFTER INSERT ON classes "
+        "BEGIN UPDATE schedule_version SET version = version + 1; END"
+    ),
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS trg_schedule_version_update AFTER UPDATE ON classes "
+        "BEGIN UPDATE schedule_version SET version = version + 1; END"
+    ),
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS trg_schedule_version_delete AFTER DELETE ON classes "
+        "BEGIN UPDATE schedule_version SET version = version + 1; END"
+    ),
+)
+
+for _ddl in SCHEDULE_VERSION_DDL:
+    event.listen(FitnessClass.__table__, "after_create", _ddl.execute_if(dialect="sqlite"))
+
+
+def day_name(day_of_week: int) -> str:
+    return DAY_NAMES.get(day_of_week, f"Day {day_of_week}")
+
+
+def schedule_version(db: "OrmSession") -> int:
+    return db.execute(text("SELECT version FROM schedule_version WHERE id = 1")).scalar_one()
+
+
+def entry_key(entry: dict) -> tuple:
+    # same timetable order as FitnessClass.page_key()
+    return (entry["day_of_week"], entry["start_time"], entry["id"])
+
+
+class WeeklyTimetable:
+    """Read-only snapshot of the week: one dict per class, in timetable order.
+
+    Built from a single joined query and shared per engine until the
+    schedule_version counter moves. Entries are shared between callers, so
+    treat them as read-only.
+    """
+
+    _snapshots: "WeakKeyDictionary" = WeakKeyDictionary()
+    _snapshots_lock = Lock()
+
+    def __init__(self, version: int, entries: list[dict]):
+        self.version = version
+        self.entries = entries
+        self._keys = [entry_key(entry) for entry in entries]
+
+    @classmethod
+    def current(cls, db: "OrmSession") -> "WeeklyTimetable":
+        # read the version before the rows: a write landing in between makes the
+        # snapshot newer than its stamp, which only costs one extra rebuild
+        version = schedule_version(db)
+        engine = db.get_bind()
+        with cls._snapshots_lock:
+            snapshot = cls._snapshots.get(engine)
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        snapshot = cls.build(db, version)
+        with cls._snapshots_lock:
+            cls._snapshots[engine] = snapshot
+        return snapshot
+
+    @classmethod
+    def build(cls, db: "OrmSession", version: int) -> "WeeklyTimetable":
+        rows = db.execute(
+            select(
+                FitnessClass.id,
+                FitnessClass.name,
+                FitnessClass.day_of_week,
+                FitnessClass.start_time,
+                FitnessClass.end_time,
+                FitnessClass.capacity,
+                FitnessClass.enrolled_count,
+                FitnessClass.seats_left.label("seats_left"),
+                FitnessClass.trainer_id,
+                User.name.label("trainer_name"),
+                FitnessClass.room_id,
+                Room.name.label("room_name"),
+            )
+            .join(User, User.id == FitnessClass.trainer_id)
+            .outerjoin(Room, Room.id == FitnessClass.room_id)
+            .order_by(FitnessClass.day_of_week, FitnessClass.start_time, FitnessClass.id)
+        ).mappings()
+        entries = []
+        for row in rows:
+            entry = dict(row)
+            entry["day_name"] = day_name(row["day_of_week"])
+            entries.append(entry)
+        return cls(version, entries)
+
+    def page(self, after_key: tuple | None = None, limit: int = 50) -> list[dict]:
+        start = 0 if after_key is None else bisect_right(self._keys, tuple(after_key))
+        return self.entries[start:start + limit]
+
+    def for_trainer(self, trainer_id: int) -> list[dict]:
+        return [entry for entry in self.entries if entry["trainer_id"] == trainer_id]
@@ -3,9 +3,13 @@ from sqlalchemy import func
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session as OrmSession
 from user import User
+from identity_cache import email_key, identity_cache, name_key
 from member import Member
+from member_search import search_members
 from fitness_class import FitnessClass
 from trainer_availability import TrainerAvailability
+from schedule_solver import merge_intervals
+from timetable import day_name
 
 
 class Trainer(User):
@@ -30,6 +34,7 @@ class Trainer(User):
                 raise ValueError("Email already registered")
             raise
 
+        identity_cache.invalidate(email_key("trainer", email))
         db.refresh(trainer)
         return trainer
 
@@ -48,6 +53,59 @@ class Trainer(User):
             end_time=end_time,
         )
 
+    def replace_weekly_availability(
+        self,
+        db: "OrmSession",
+        windows,
+    ) -> dict:
+        """Make (day_of_week, start_time, end_time) windows the trainer's whole week.
+
+        Overlapping and touching windows are merged first; only the rows that
+        differ from what is stored are deleted or inserted, in one commit.
+        """
+        desired = {}
+        for day_of_week, start_time, end_time in windows:
+            if end_time <= start_time:
+                raise ValueError("end_time must be after start_time")
+            if not (1 <= day_of_week <= 7):
+                raise ValueError("day_of_week must be between 1 and 7")
+            desired.setdefault(day_of_week, []).append((start_time, end_time))
+        desired = {day: merge_intervals(intervals) for day, intervals in desired.items()}
+
+        # a class has to stay inside one of the new windows
+        for session in self.get_schedule(db):
+            if not any(
+                start <= session.start_time and session.end_time <= end
+                for start, end in desired.get(session.day_of_week, ())
+            ):
+                raise ValueError(
+                    f"Class '{session.name}' ({day_name(session.day_of_week)} "
+                    f"{session.start_time} - {session.end_time}) would be left outside your availability."
+                )
+
+        wanted = {(day, start, end) for day, intervals in desired.items() for start, end in intervals}
+        stored = self.get_availability(db)
+        removed = [window for window in stored if (window.day_of_week, window.start_time, window.end_time) not in wanted]
+        kept = {(window.day_of_week, window.start_time, window.end_time) for window in stored} & wanted
+        added = [
+            TrainerAvailability(trainer_id=self.id, day_of_week=day, start_time=start, end_time=end)
+            for day, start, end in sorted(wanted - kept)
+        ]
+
+        if removed or added:
+            for window in removed:
+                db.delete(window)
+            # deletes first, so a new window never meets the old one it replaces
+            db.flush()
+            db.add_all(added)
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                raise ValueError("Availability was changed by someone else; try again.")
+
+        return {"added": len(added), "removed": len(removed), "unchanged": len(kept)}
+
     def get_schedule(
         self,
         db: "OrmSession",
@@ -60,13 +118,28 @@ class Trainer(User):
         db: "OrmSession",
         name: str,
     ) -> Member | None:
-        member = (
-            db.query(Member)
-            .filter(func.lower(Member.name) == func.lower(name))
-            .first()
-        )
+        key = name_key("member", name)
+        member = identity_cache.get(db, key)
+        if member is None:
+            # matches ix_users_name_lower
+            member = (
+                db.query(Member)
+                .filter(func.lower(Member.name) == func.lower(name.strip()))
+                .first()
+            )
+            if member is not None:
+                identity_cache.put(key, member)
         return member
 
+    def search_members(
+        self,
+        db: "OrmSession",
+        query: str,
+        limit: int = 10,
+    ) -> list[Member]:
+        # prefix match on every word of the name, best bm25 rank first
+        return search_members(db, query, limit)
+
     def get_availability(
         self,
         db: "OrmSession",
@@ -1,7 +1,8 @@
 from datetime import time
-from sqlalchemy import Column, Integer, Time, ForeignKey, UniqueConstraint
-from sqlalchemy.orm import relationship, Session as OrmSession
+from sqlalchemy import Column, Integer, Time, ForeignKey, UniqueConstraint, event
+from sqlalchemy.orm import relationship, selectinload, Session as OrmSession
 from user import Base, User
+from schedule_index import WINDOW_SLOT_TRIGGERS
 
 
 class TrainerAvailability(Base):
@@ -15,10 +16,16 @@ class TrainerAvailability(Base):
 
     trainer = relationship("User")
 
+    # the unique constraint's index (trainer_id, day_of_week, start_time, end_time)
+    # also serves the availability and overlap lookups
     __table_args__ = (
         UniqueConstraint("trainer_id", "day_of_week", "start_time", "end_time", name="uq_trainer_availability_exact"),
     )
 
+    @classmethod
+    def with_trainer(cls) -> tuple:
+        return (selectinload(cls.trainer),)
+
     @classmethod
     def create_window(
         cls,
@@ -35,7 +42,7 @@ class TrainerAvailability(Base):
             raise ValueError("day_of_week must be between 1 and 7")
 
         overlap = (
-            db.query(cls)
+            db.query(cls.id)
             .filter(
                 cls.trainer_id == trainer_id,
                 cls.day_of_week == day_of_week,
@@ -58,3 +65,7 @@ class TrainerAvailability(Base):
         db.commit()
         db.refresh(window)
         return window
+
+
+for _ddl in WINDOW_SLOT_TRIGGERS:
+    event.listen(TrainerAvailability.__table__, "after_create", _ddl.execute_if(dialect="sqlite"))
@@ -0,0 +1,71 @@
+import os
+import socket
+import time
+import zlib
+from threading import Lock
+
+# 63-bit layout (fits a signed SQLite INTEGER): 41 bits of milliseconds since
+# EPOCH_MS, 10 bits of node id, 12 bits of per-millisecond sequence
+EPOCH_MS = 1735689600000  # 2025-01-01T00:00:00Z
+NODE_BITS = 10
+SEQUENCE_BITS = 12
+MAX_NODE = (1 << NODE_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+
+class TransactionCodeGenerator:
+    """Time-ordered 64-bit ids generated without touching the database.
+
+    The node id comes from HEALTH_CLUB_NODE_ID, or else from the host name
+    and pid, so processes on one host get distinct node ids unless their pids
+    are 1024 apart. Any remaining collision trips the unique index on
+    payments.transaction_code, and the writers retry with a fresh code.
+    """
+
+    def __init__(self, node_id: int | None = None):
+        self._lock = Lock()
+        self._last_ms = 0
+        self._sequence = 0
+        self._fixed_node = node_id
+        self.node_id = self._pick_node()
+
+    def _pick_node(self) -> int:
+        if self._fixed_node is not None:
+            return self._fixed_node & MAX_NODE
+        configured = os.environ.get("HEALTH_CLUB_NODE_ID")
+        if configured:
+            return int(configured) & MAX_NODE
+        # pid in the low bits keeps live processes on one host apart; the host
+        # hash spreads hosts over the node space
+        return (zlib.crc32(socket.gethostname().encode()) + os.getpid()) & MAX_NODE
+
+    def reseed(self) -> None:
+        with self._lock:
+            self.node_id = self._pick_node()
+            self._last_ms = 0
+            self._sequence = 0
+
+    def next_id(self) -> int:
+        with self._lock:
+            now_ms = int(time.time() * 1000) - EPOCH_MS
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._sequence = 0
+            else:
+                # same millisecond or the clock stepped back: keep counting
+                # forward on the last timestamp so ids stay monotonic
+                self._sequence += 1
+                if self._sequence > MAX_SEQUENCE:
+                    self._last_ms += 1
+                    self._sequence = 0
+            return (self._last_ms << (NODE_BITS + SEQUENCE_BITS)) | (self.node_id << SEQUENCE_BITS) | self._sequence
+
+
+_generator = TransactionCodeGenerator()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_generator.reseed)
+
+
+def next_transaction_code() -> int:
+    return _generator.next_id()
@@ -0,0 +1,85 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+
+class TtlLruCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds.
+
+    Each entry can carry tags (a user id, the class ids on a dashboard), and
+    a reverse map from tag to keys lets a write find every entry it touches.
+    Subclasses expose typed get/put methods on top of lookup() and store().
+    """
+
+    def __init__(self, max_size: int = 4096, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        self._entries: OrderedDict = OrderedDict()
+        self._keys_by_tag: dict = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _export(self, value):
+        # runs under the lock; override to hand out copies of mutable values
+        return value
+
+    def lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < monotonic():
+                if entry is not None:
+                    self._discard(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._export(entry[1])
+
+    def store(self, key, value, tags=()) -> None:
+        with self._lock:
+            self._discard(key)
+            tags = tuple(tags)
+            self._entries[key] = (monotonic() + self.ttl, value, tags)
+            for tag in tags:
+                self._keys_by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate(self, *keys) -> None:
+        with self._lock:
+            for key in keys:
+                self._discard(key)
+
+    def invalidate_tag(self, tag) -> None:
+        with self._lock:
+            for key in list(self._keys_by_tag.get(tag, ())):
+                self._discard(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_tag.clear()
+
+    def _value(self, key):
+        # caller holds the lock; no LRU or TTL bookkeeping
+        entry = self._entries.get(key)
+        return None if entry is None else entry[1]
+
+    def _tagged(self, tag) -> list:
+        # caller holds the lock
+        return list(self._keys_by_tag.get(tag, ()))
+
+    def _discard(self, key) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String
-from sqlalchemy.orm import declarative_base
+from sqlalchemy import Column, Index, Integer, String, func
+from sqlalchemy.orm import declarative_base, Session as OrmSession
+from identity_cache import email_key, identity_cache
 
 Base = declarative_base()
 
@@ -15,3 +16,26 @@ class User(Base):
         "polymorphic_on": user_type,
         "polymorphic_identity": "user",
     }
+
+    # lets case-insensitive name lookups (lower(name) = lower(?)) use an index
+    __table_args__ = (
+        Index("ix_users_name_lower", func.lower(name)),
+    )
+
+    @classmethod
+    def get_by_email(cls, db: "OrmSession", email: str):
+        key = email_key(cls.__mapper__.polymorphic_identity, email)
+        user = identity_cache.get(db, key)
+        if user is None:
+            user = db.query(cls).filter(cls.email == email.strip()).first()
+            if user is not None:
+                identity_cache.put(key, user)
+        return user
+
+    @classmethod
+    def iter_page(cls, db: "OrmSession", after_id: int | None = None, limit: int = 50) -> list:
+        # keyset pagination on the primary key: each page is an index range scan
+        query = db.query(cls)
+        if after_id is not None:
+            query = query.filter(cls.id > after_id)
+        return query.order_by(cls.id).limit(limit).all()
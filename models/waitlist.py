@@ -0,0 +1,148 @@
+from datetime import datetime
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, UniqueConstraint, delete, func, insert, literal, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased, Session as OrmSession
+from user import Base
+from enrollment import Enrollment
+from fitness_class import FitnessClass
+from dashboard_cache import dashboard_cache
+
+
+class WaitlistEntry(Base):
+    """FIFO waitlist for full classes.
+
+    sequence is dense per class (leaving closes the gap), so a member's
+    position is sequence - head sequence + 1: two index lookups, whatever the
+    length of the queue.
+    """
+
+    __tablename__ = "waitlist_entries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    class_id = Column(Integer, ForeignKey("classes.id"), nullable=False)
+    member_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    sequence = Column(Integer, nullable=False)
+    joined_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        # member first, so it also serves a member's own waitlists
+        UniqueConstraint("member_id", "class_id", name="uq_waitlist_member"),
+        Index("ix_waitlist_class_sequence", "class_id", "sequence"),
+    )
+
+    @classmethod
+    def join(cls, db: "OrmSession", member_id: int, class_id: int) -> int:
+        seats = db.execute(
+            select(FitnessClass.capacity, FitnessClass.enrolled_count).where(FitnessClass.id == class_id)
+        ).first()
+        if seats is None:
+            raise ValueError("Class not found")
+        if seats.capacity is None or seats.enrolled_count < seats.capacity:
+            raise ValueError("Class has open seats; register instead.")
+        enrolled = db.execute(
+            select(Enrollment.class_id).where(Enrollment.member_id == member_id, Enrollment.class_id == class_id)
+        ).first()
+        if enrolled is not None:
+            raise ValueError("Already registered for this class")
+
+        # next sequence is taken inside the insert, under SQLite's write lock
+        next_sequence = (
+            select(func.coalesce(func.max(cls.sequence), 0) + 1)
+            .where(cls.class_id == class_id)
+            .scalar_subquery()
+        )
+        statement = insert(cls).from_select(
+            ["class_id", "member_id", "sequence", "joined_at"],
+            select(literal(class_id), literal(member_id), next_sequence, literal(datetime.utcnow())),
+        )
+        try:
+            db.execute(statement)
+            db.commit()
+        except IntegrityError as exc:
+            db.rollback()
+            if "waitlist_entries.member_id, waitlist_entries.class_id" in str(exc.orig):
+                raise ValueError("Already on the waitlist for this class")
+            raise
+        return cls.position(db, member_id, class_id)
+
+    @classmethod
+    def position(cls, db: "OrmSession", member_id: int, class_id: int) -> int | None:
+        sequence = db.execute(
+            select(cls.sequence).where(cls.class_id == class_id, cls.member_id == member_id)
+        ).scalar()
+        if sequence is None:
+            return None
+        head = db.execute(select(func.min(cls.sequence)).where(cls.class_id == class_id)).scalar()
+        return sequence - head + 1
+
+    @classmethod
+    def positions_for_member(cls, db: "OrmSession", member_id: int) -> list[tuple[int, str, int]]:
+        # (class_id, class name, position) for every queue the member is in
+        queue = aliased(cls)
+        head = (
+            select(func.min(queue.sequence))
+            .where(queue.class_id == cls.class_id)
+            .scalar_subquery()
+        )
+        rows = db.execute(
+            select(cls.class_id, FitnessClass.name, cls.sequence - head + 1)
+            .join(FitnessClass, FitnessClass.id == cls.class_id)
+            .where(cls.member_id == member_id)
+            .order_by(cls.joined_at)
+        )
+        return [tuple(row) for row in rows]
+
+    @classmethod
+    def leave(cls, db: "OrmSession", member_id: int, class_id: int, commit: bool = True) -> bool:
+        sequence = db.execute(
+            select(cls.sequence).where(cls.class_id == class_id, cls.member_id == member_id)
+        ).scalar()
+        if sequence is None:
+            return False
+        db.execute(delete(cls).where(cls.class_id == class_id, cls.member_id == member_id))
+        db.execute(
+            update(cls)
+            .where(cls.class_id == class_id, cls.sequence > sequence)
+            .values(sequence=cls.sequence - 1)
+        )
+        if commit:
+            db.commit()
+        return True
+
+    @classmethod
+    def promote(cls, db: "OrmSession", class_id: int, commit: bool = True) -> list[int]:
+        """Enroll members from the head of the queue into every free seat.
+
+        Runs in the caller's transaction when commit=False, so freeing a seat
+        and filling it commit together; returns the promoted member ids.
+        """
+        seats = db.execute(
+            select(FitnessClass.capacity, FitnessClass.enrolled_count).where(FitnessClass.id == class_id)
+        ).first()
+        if seats is None:
+            return []
+        head = select(cls.member_id).where(cls.class_id == class_id).order_by(cls.sequence)
+        if seats.capacity is not None:
+            free = seats.capacity - seats.enrolled_count
+            if free <= 0:
+                return []
+            head = head.limit(free)
+        member_ids = list(db.scalars(head))
+        if not member_ids:
+            return []
+
+        registered_at = datetime.utcnow()
+        db.execute(
+            insert(Enrollment),
+            [
+                {"member_id": member_id, "class_id": class_id, "registration_date": registered_at}
+                for member_id in member_ids
+            ],
+        )
+        # the promoted members were the head, so the rest keep their order and
+        # positions stay sequence - head + 1
+        db.execute(delete(cls).where(cls.class_id == class_id, cls.member_id.in_(member_ids)))
+        if commit:
+            db.commit()
+        dashboard_cache.invalidate(*member_ids)
+        return member_ids